@@ -0,0 +1,79 @@
+from components.postgres.postgres_conn_utils import get_db
+import logging
+from logging_config import db_logger, error_logger
+from metrics import timed_db
+
+@timed_db
+def save_message_audio_db(message_id, content_hash, mime_type, byte_size, storage_path):
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Saving audio for message ID: %s", message_id)
+        cur.execute(
+            """
+            INSERT INTO message_audio (message_id, content_hash, mime_type, byte_size, storage_path)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (message_id) DO UPDATE SET
+                content_hash = EXCLUDED.content_hash,
+                mime_type = EXCLUDED.mime_type,
+                byte_size = EXCLUDED.byte_size,
+                storage_path = EXCLUDED.storage_path,
+                created_at = CURRENT_TIMESTAMP
+            """,
+            (message_id, content_hash, mime_type, byte_size, storage_path)
+        )
+        db.commit()
+        return True
+    except Exception as e:
+        error_logger.error("save_message_audio_db error: %s", e, exc_info=True)
+        return False
+
+@timed_db
+def get_message_audio_db(session_id, message_id, user_id):
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Fetching audio for message ID: %s", message_id)
+        # Only return audio for messages in a session owned by the user
+        cur.execute(
+            """
+            SELECT a.content_hash, a.mime_type, a.byte_size, a.storage_path
+            FROM message_audio a
+            JOIN messages m ON m.id = a.message_id
+            JOIN chatsessions s ON s.id = m.session_id
+            WHERE a.message_id=%s AND m.session_id=%s AND s.user_id=%s
+            """,
+            (message_id, session_id, user_id)
+        )
+        r = cur.fetchone()
+        if not r:
+            return None
+        return {'content_hash': r[0], 'mime_type': r[1], 'byte_size': r[2], 'storage_path': r[3]}
+    except Exception as e:
+        error_logger.error("get_message_audio_db error: %s", e, exc_info=True)
+        return None
+
+@timed_db
+def get_user_message_audio_db(message_id, user_id):
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Fetching audio of user message ID: %s", message_id)
+        # Same ownership check as get_message_audio_db, for callers that only know the message
+        cur.execute(
+            """
+            SELECT a.content_hash, a.mime_type, a.byte_size, a.storage_path
+            FROM message_audio a
+            JOIN messages m ON m.id = a.message_id
+            JOIN chatsessions s ON s.id = m.session_id
+            WHERE a.message_id=%s AND s.user_id=%s
+            """,
+            (message_id, user_id)
+        )
+        r = cur.fetchone()
+        if not r:
+            return None
+        return {'content_hash': r[0], 'mime_type': r[1], 'byte_size': r[2], 'storage_path': r[3]}
+    except Exception as e:
+        error_logger.error("get_user_message_audio_db error: %s", e, exc_info=True)
+        return None
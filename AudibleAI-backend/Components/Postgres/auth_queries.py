@@ -1,50 +1,74 @@
 from components.postgres.postgres_conn_utils import get_db
+from components.postgres.write_behind import get_write_behind
 import logging
-from logging_config import app_logger, error_logger
+from logging_config import db_logger, error_logger
+from metrics import timed_db
 
+@timed_db
 def get_user_by_email_db(email):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Fetching user by email: {email}")
+        db_logger.info("DB Query: Fetching user by email: %s", email)
         cur.execute("SELECT id, password_hash FROM users WHERE email=%s", (email,))
         return cur.fetchone()
     except Exception as e:
-        error_logger.error(f"get_user_by_email_db error: {e}", exc_info=True)
+        error_logger.error("get_user_by_email_db error: %s", e, exc_info=True)
         return None
 
+@timed_db
 def user_exists_db(email):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Checking if user exists with email: {email}")
+        db_logger.info("DB Query: Checking if user exists with email: %s", email)
         cur.execute("SELECT id FROM users WHERE email=%s", (email,))
         return cur.fetchone() is not None
     except Exception as e:
-        error_logger.error(f"user_exists_db error: {e}", exc_info=True)
+        error_logger.error("user_exists_db error: %s", e, exc_info=True)
         return False
 
+@timed_db
 def create_user_db(email, password_hash):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Creating new user with email: {email}")
+        db_logger.info("DB Query: Creating new user with email: %s", email)
         cur.execute("INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id", (email, password_hash))
         user_id = cur.fetchone()[0]
         db.commit()
-        app_logger.info(f"DB Query: Successfully created user with ID: {user_id}")
+        db_logger.info("DB Query: Successfully created user with ID: %s", user_id)
         return user_id
     except Exception as e:
-        error_logger.error(f"create_user_db error: {e}", exc_info=True)
+        error_logger.error("create_user_db error: %s", e, exc_info=True)
         return None
 
+@timed_db
 def update_last_login_db(user_id):
+    """
+    Queued on the group-commit writer: last_login_at is not worth its own fsync on the login path.
+    """
     try:
-        db = get_db()
-        cur = db.cursor()
-        app_logger.info(f"DB Query: Updating last login timestamp for user ID: {user_id}")
-        cur.execute("UPDATE users SET last_login_at=NOW() WHERE id=%s", (user_id,))
-        db.commit()
-        app_logger.info(f"DB Query: Successfully updated last login for user ID: {user_id}")
+        db_logger.info("DB Query: Queueing last login timestamp for user ID: %s", user_id)
+        get_write_behind().enqueue(
+            ('last_login', str(user_id)),
+            "UPDATE users SET last_login_at=NOW() WHERE id=%s",
+            (user_id,)
+        )
+    except Exception as e:
+        error_logger.error("update_last_login_db error: %s", e, exc_info=True)
+
+@timed_db
+def update_password_hash_db(user_id, password_hash):
+    """
+    Queued on the group-commit writer: used for transparent rehash-on-login.
+    """
+    try:
+        db_logger.info("DB Query: Queueing password rehash for user ID: %s", user_id)
+        get_write_behind().enqueue(
+            ('password_hash', str(user_id)),
+            "UPDATE users SET password_hash=%s WHERE id=%s",
+            (password_hash, user_id)
+        )
     except Exception as e:
-        error_logger.error(f"update_last_login_db error: {e}", exc_info=True)
+        error_logger.error("update_password_hash_db error: %s", e, exc_info=True)
@@ -1,102 +1,308 @@
 from components.postgres.postgres_conn_utils import get_db
 import uuid
 import logging
-from logging_config import app_logger, error_logger
+from logging_config import db_logger, error_logger
+from metrics import timed_db
 
+SESSION_LIST_SELECT = """
+    SELECT id, title, last_activity_at, message_count, last_message_preview, last_message_sender
+    FROM chatsessions
+    WHERE user_id=%s
+"""
+
+def _session_row(r):
+    return {
+        'id': r[0],
+        'title': r[1],
+        'last_activity_at': r[2],
+        'message_count': r[3],
+        'last_message_preview': r[4],
+        'last_message_sender': r[5]
+    }
+
+@timed_db
 def get_sessions_db(user_id):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Fetching chat sessions for user ID: {user_id}")
-        cur.execute("SELECT id, title FROM chatsessions WHERE user_id=%s", (user_id,))
-        sessions = [{'id': r[0], 'title': r[1]} for r in cur.fetchall()]
-        app_logger.info(f"DB Query: Found {len(sessions)} chat sessions")
+        db_logger.info("DB Query: Fetching chat sessions for user ID: %s", user_id)
+        # Activity, count and preview are denormalised onto chatsessions by trigger, so this is one indexed scan
+        cur.execute(SESSION_LIST_SELECT + " ORDER BY last_activity_at DESC, id DESC", (user_id,))
+        sessions = [_session_row(r) for r in cur.fetchall()]
+        db_logger.info("DB Query: Found %s chat sessions", len(sessions))
         return sessions
     except Exception as e:
-        error_logger.error(f"get_sessions_db error: {e}", exc_info=True)
+        error_logger.error("get_sessions_db error: %s", e, exc_info=True)
         return []
 
+@timed_db
+def get_sessions_page_db(user_id, limit, before=None):
+    """
+    Keyset page of sessions, most recently active first.
+    before is a (last_activity_at, id) position from the previous page.
+    """
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Fetching session page for user ID: %s (limit=%s, before=%s)", user_id, limit, before is not None)
+        if before is not None:
+            cur.execute(SESSION_LIST_SELECT + " AND (last_activity_at, id) < (%s, %s) ORDER BY last_activity_at DESC, id DESC LIMIT %s",
+                        (user_id, before[0], before[1], limit + 1))
+        else:
+            cur.execute(SESSION_LIST_SELECT + " ORDER BY last_activity_at DESC, id DESC LIMIT %s", (user_id, limit + 1))
+        rows = cur.fetchall()
+        has_more = len(rows) > limit
+        sessions = [_session_row(r) for r in rows[:limit]]
+        db_logger.info("DB Query: Found %s chat sessions in page (has_more=%s)", len(sessions), has_more)
+        return sessions, has_more
+    except Exception as e:
+        error_logger.error("get_sessions_page_db error: %s", e, exc_info=True)
+        return [], False
+
+@timed_db
 def create_session_db(user_id, title):
     try:
         db = get_db()
         cur = db.cursor()
         session_id = str(uuid.uuid4())
-        app_logger.info(f"DB Query: Creating new chat session for user ID: {user_id}, title: {title}")
+        db_logger.info("DB Query: Creating new chat session for user ID: %s, title: %s", user_id, title)
         cur.execute("INSERT INTO chatsessions (id, user_id, title) VALUES (%s, %s, %s)", (session_id, user_id, title))
         db.commit()
-        app_logger.info(f"DB Query: Successfully created chat session with ID: {session_id}")
+        db_logger.info("DB Query: Successfully created chat session with ID: %s", session_id)
         return session_id
     except Exception as e:
-        error_logger.error(f"create_session_db error: {e}", exc_info=True)
+        error_logger.error("create_session_db error: %s", e, exc_info=True)
         return None
 
-def get_messages_db(session_id):
+@timed_db
+def is_session_owner_db(session_id, user_id):
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Checking owner of session ID: %s for user ID: %s", session_id, user_id)
+        cur.execute("SELECT 1 FROM chatsessions WHERE id=%s AND user_id=%s", (session_id, user_id))
+        return cur.fetchone() is not None
+    except Exception as e:
+        error_logger.error("is_session_owner_db error: %s", e, exc_info=True)
+        return False
+
+@timed_db
+def get_messages_db(session_id, user_id):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Fetching messages for session ID: {session_id}")
-        cur.execute("SELECT id, sender, text, created_at FROM messages WHERE session_id=%s ORDER BY created_at ASC", (session_id,))
-        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3]} for r in cur.fetchall()]
-        app_logger.info(f"DB Query: Found {len(messages)} messages in session")
+        db_logger.info("DB Query: Fetching messages for session ID: %s", session_id)
+        # Only return messages of a session owned by the user
+        cur.execute(
+            """
+            SELECT m.id, m.sender, m.text, m.created_at, a.message_id IS NOT NULL
+            FROM messages m
+            JOIN chatsessions s ON s.id = m.session_id
+            LEFT JOIN message_audio a ON a.message_id = m.id
+            WHERE m.session_id=%s AND s.user_id=%s
+            ORDER BY m.created_at ASC, m.id ASC
+            """,
+            (session_id, user_id)
+        )
+        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3], 'has_audio': r[4]} for r in cur.fetchall()]
+        db_logger.info("DB Query: Found %s messages in session", len(messages))
         return messages
     except Exception as e:
-        error_logger.error(f"get_messages_db error: {e}", exc_info=True)
+        error_logger.error("get_messages_db error: %s", e, exc_info=True)
         return []
 
+@timed_db
+def get_messages_page_db(session_id, user_id, limit, before=None, after=None):
+    """
+    Keyset-paginated messages of a session owned by user_id, returned oldest first.
+    before/after are (created_at, id) positions; with neither, the latest page is returned.
+    Fetches limit + 1 rows to know whether another page exists without a COUNT.
+    Served by idx_messages_session_created (session_id, created_at, id).
+    """
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Fetching message page for session ID: %s (limit=%s, before=%s, after=%s)", session_id, limit, before is not None, after is not None)
+        select = """
+            SELECT m.id, m.sender, m.text, m.created_at, a.message_id IS NOT NULL
+            FROM messages m
+            JOIN chatsessions s ON s.id = m.session_id
+            LEFT JOIN message_audio a ON a.message_id = m.id
+            WHERE m.session_id=%s AND s.user_id=%s
+        """
+        if after is not None:
+            cur.execute(select + " AND (m.created_at, m.id) > (%s, %s) ORDER BY m.created_at ASC, m.id ASC LIMIT %s",
+                        (session_id, user_id, after[0], after[1], limit + 1))
+            rows = cur.fetchall()
+        else:
+            if before is not None:
+                cur.execute(select + " AND (m.created_at, m.id) < (%s, %s) ORDER BY m.created_at DESC, m.id DESC LIMIT %s",
+                            (session_id, user_id, before[0], before[1], limit + 1))
+            else:
+                cur.execute(select + " ORDER BY m.created_at DESC, m.id DESC LIMIT %s", (session_id, user_id, limit + 1))
+            rows = cur.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is None:
+            rows.reverse()
+        messages = [{'id': r[0], 'sender': r[1], 'text': r[2], 'created_at': r[3], 'has_audio': r[4]} for r in rows]
+        db_logger.info("DB Query: Found %s messages in page (has_more=%s)", len(messages), has_more)
+        return messages, has_more
+    except Exception as e:
+        error_logger.error("get_messages_page_db error: %s", e, exc_info=True)
+        return [], False
+
+@timed_db
 def add_user_message_db(session_id, text):
     try:
         db = get_db()
         cur = db.cursor()
         msg_id = str(uuid.uuid4())
-        app_logger.info(f"DB Query: Adding user message in session ID: {session_id}")
+        db_logger.info("DB Query: Adding user message in session ID: %s", session_id)
         cur.execute("INSERT INTO messages (id, session_id, sender, text) VALUES (%s, %s, %s, %s)", (msg_id, session_id, 'USER', text))
         db.commit()
-        app_logger.info(f"DB Query: Successfully added user message with ID: {msg_id}")
+        db_logger.info("DB Query: Successfully added user message with ID: %s", msg_id)
         return msg_id
     except Exception as e:
-        error_logger.error(f"add_user_message_db error: {e}", exc_info=True)
+        error_logger.error("add_user_message_db error: %s", e, exc_info=True)
         return None
 
-def add_ai_message_db(session_id, ai_text):
+@timed_db
+def add_ai_message_db(session_id, ai_text, ai_msg_id=None):
     try:
         db = get_db()
         cur = db.cursor()
-        ai_msg_id = str(uuid.uuid4())
-        app_logger.info(f"DB Query: Adding AI message in session ID: {session_id}")
+        # Callers may pre-allocate the id so audio can be tagged before the text is persisted
+        ai_msg_id = ai_msg_id or str(uuid.uuid4())
+        db_logger.info("DB Query: Adding AI message in session ID: %s", session_id)
         cur.execute("INSERT INTO messages (id, session_id, sender, text) VALUES (%s, %s, %s, %s)", (ai_msg_id, session_id, 'AI', ai_text))
         db.commit()
-        app_logger.info(f"DB Query: Successfully added AI message with ID: {ai_msg_id}")
+        db_logger.info("DB Query: Successfully added AI message with ID: %s", ai_msg_id)
         return ai_msg_id
     except Exception as e:
-        error_logger.error(f"add_ai_message_db error: {e}", exc_info=True)
+        error_logger.error("add_ai_message_db error: %s", e, exc_info=True)
         return None
 
+@timed_db
+def add_turn_db(session_id, user_text, ai_text, ai_msg_id=None):
+    """
+    Persists a whole chat turn (user message, AI message and, via trigger, the session
+    activity bump) in one statement and one commit.
+    The AI row is stamped one microsecond after the user row so history order is stable.
+    """
+    try:
+        db = get_db()
+        cur = db.cursor()
+        user_msg_id = str(uuid.uuid4())
+        ai_msg_id = ai_msg_id or str(uuid.uuid4())
+        db_logger.info("DB Query: Adding chat turn in session ID: %s", session_id)
+        cur.execute(
+            """
+            WITH user_msg AS (
+                INSERT INTO messages (id, session_id, sender, text, created_at)
+                VALUES (%s, %s, 'USER', %s, clock_timestamp())
+                RETURNING created_at
+            )
+            INSERT INTO messages (id, session_id, sender, text, created_at)
+            SELECT %s, %s, 'AI', %s, created_at + INTERVAL '1 microsecond' FROM user_msg
+            """,
+            (user_msg_id, session_id, user_text, ai_msg_id, session_id, ai_text)
+        )
+        db.commit()
+        db_logger.info("DB Query: Successfully added chat turn with user ID: %s, AI ID: %s", user_msg_id, ai_msg_id)
+        return user_msg_id, ai_msg_id
+    except Exception as e:
+        error_logger.error("add_turn_db error: %s", e, exc_info=True)
+        return None, None
+
+@timed_db
 def delete_session_db(session_id, user_id):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Deleting chat session ID: {session_id} for user ID: {user_id}")
+        db_logger.info("DB Query: Deleting chat session ID: %s for user ID: %s", session_id, user_id)
         # Only allow user to delete their own session
         cur.execute("DELETE FROM chatsessions WHERE id=%s AND user_id=%s", (session_id, user_id))
         db.commit()
         success = cur.rowcount > 0
-        app_logger.info(f"DB Query: Session deletion {'successful' if success else 'failed - session not found or not owned by user'}")
+        db_logger.info("DB Query: Session deletion %s", 'successful' if success else 'failed - session not found or not owned by user')
         return success
     except Exception as e:
-        error_logger.error(f"delete_session_db error: {e}", exc_info=True)
+        error_logger.error("delete_session_db error: %s", e, exc_info=True)
         return False
 
+@timed_db
 def update_session_title_db(session_id, user_id, new_title):
     try:
         db = get_db()
         cur = db.cursor()
-        app_logger.info(f"DB Query: Updating title of session ID: {session_id} for user ID: {user_id}")
+        db_logger.info("DB Query: Updating title of session ID: %s for user ID: %s", session_id, user_id)
         # Only allow user to update their own session
         cur.execute("UPDATE chatsessions SET title=%s WHERE id=%s AND user_id=%s", (new_title, session_id, user_id))
         db.commit()
         success = cur.rowcount > 0
-        app_logger.info(f"DB Query: Title update {'successful' if success else 'failed - session not found or not owned by user'}")
+        db_logger.info("DB Query: Title update %s", 'successful' if success else 'failed - session not found or not owned by user')
+        return success
+    except Exception as e:
+        error_logger.error("update_session_title_db error: %s", e, exc_info=True)
+        return False
+
+
+@timed_db
+def get_session_summary_db(session_id):
+    """
+    Returns the rolling summary row of a session, or None if nothing has been summarised yet.
+    """
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Fetching summary for session ID: %s", session_id)
+        cur.execute(
+            "SELECT summary, covered_until_at, covered_until_id, covered_messages FROM session_summaries WHERE session_id=%s",
+            (session_id,)
+        )
+        r = cur.fetchone()
+        if not r:
+            return None
+        return {'summary': r[0], 'covered_until': (r[1], r[2]), 'covered_messages': r[3]}
+    except Exception as e:
+        error_logger.error("get_session_summary_db error: %s", e, exc_info=True)
+        return None
+
+@timed_db
+def save_session_summary_db(session_id, summary, covered_until, covered_messages, previous_until=None):
+    """
+    Stores a new rolling summary covering messages up to covered_until (created_at, id).
+    Compare-and-set on previous_until, so a concurrent update of the same session wins
+    and this one is dropped instead of overwriting a newer summary.
+    """
+    try:
+        db = get_db()
+        cur = db.cursor()
+        db_logger.info("DB Query: Saving summary for session ID: %s (%s messages)", session_id, covered_messages)
+        if previous_until is None:
+            cur.execute(
+                """
+                INSERT INTO session_summaries (session_id, summary, covered_until_at, covered_until_id, covered_messages)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (session_id) DO NOTHING
+                """,
+                (session_id, summary, covered_until[0], covered_until[1], covered_messages)
+            )
+        else:
+            cur.execute(
+                """
+                UPDATE session_summaries
+                SET summary=%s, covered_until_at=%s, covered_until_id=%s, covered_messages=%s, updated_at=CURRENT_TIMESTAMP
+                WHERE session_id=%s AND covered_until_at=%s AND covered_until_id=%s
+                """,
+                (summary, covered_until[0], covered_until[1], covered_messages,
+                 session_id, previous_until[0], previous_until[1])
+            )
+        db.commit()
+        success = cur.rowcount > 0
+        db_logger.info("DB Query: Summary save %s", 'successful' if success else 'skipped - summary changed concurrently or session gone')
         return success
     except Exception as e:
-        error_logger.error(f"update_session_title_db error: {e}", exc_info=True)
+        error_logger.error("save_session_summary_db error: %s", e, exc_info=True)
         return False
@@ -0,0 +1,46 @@
+"""
+Applies pending SQL migrations from the migrations/ folder in file-name order.
+Each file runs in its own transaction and is recorded in schema_migrations.
+
+Usage: python Components/Postgres/migrate.py
+"""
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def apply_migrations(dsn):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name VARCHAR(255) PRIMARY KEY,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute("SELECT name FROM schema_migrations")
+                applied = {r[0] for r in cur.fetchall()}
+
+        for name in sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql')):
+            if name in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+                sql = f.read()
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            print(f"Applied {name}")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    load_dotenv()
+    dsn = os.getenv('DATABASE_URL')
+    if not dsn:
+        sys.exit("DATABASE_URL is not set")
+    apply_migrations(dsn)
@@ -0,0 +1,9 @@
+-- Stored audio per message (see schema.sql)
+CREATE TABLE IF NOT EXISTS message_audio (
+    message_id UUID PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+    content_hash CHAR(64) NOT NULL,
+    mime_type VARCHAR(64) NOT NULL,
+    byte_size INTEGER NOT NULL,
+    storage_path VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
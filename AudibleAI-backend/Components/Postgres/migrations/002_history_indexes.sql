@@ -0,0 +1,5 @@
+-- Keyset pagination of a session's history: WHERE session_id = ? AND (created_at, id) < (?, ?)
+CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages (session_id, created_at, id);
+
+-- Sidebar listing: a user's sessions by most recent activity
+CREATE INDEX IF NOT EXISTS idx_chatsessions_user_activity ON chatsessions (user_id, last_activity_at DESC);
@@ -0,0 +1,43 @@
+-- Denormalised sidebar data on chatsessions, kept current by a trigger on messages
+ALTER TABLE chatsessions ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chatsessions ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR(200);
+ALTER TABLE chatsessions ADD COLUMN IF NOT EXISTS last_message_sender VARCHAR(10);
+
+-- Backfill from existing history
+UPDATE chatsessions s
+SET message_count = agg.message_count,
+    last_activity_at = agg.last_created_at,
+    last_message_preview = LEFT(agg.last_text, 200),
+    last_message_sender = agg.last_sender
+FROM (
+    SELECT DISTINCT ON (session_id)
+        session_id,
+        COUNT(*) OVER (PARTITION BY session_id) AS message_count,
+        created_at AS last_created_at,
+        text AS last_text,
+        sender::text AS last_sender
+    FROM messages
+    ORDER BY session_id, created_at DESC, id DESC
+) agg
+WHERE s.id = agg.session_id;
+
+-- Replace the activity index with one that also covers the id tie-breaker
+DROP INDEX IF EXISTS idx_chatsessions_user_activity;
+CREATE INDEX idx_chatsessions_user_activity ON chatsessions (user_id, last_activity_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION bump_session_activity() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE chatsessions
+    SET last_activity_at = NEW.created_at,
+        message_count = message_count + 1,
+        last_message_preview = LEFT(NEW.text, 200),
+        last_message_sender = NEW.sender::text
+    WHERE id = NEW.session_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_messages_session_activity ON messages;
+CREATE TRIGGER trg_messages_session_activity
+    AFTER INSERT ON messages
+    FOR EACH ROW EXECUTE FUNCTION bump_session_activity();
@@ -0,0 +1,9 @@
+-- Rolling conversation summaries for turns that fall out of the LLM context window (see schema.sql)
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id UUID PRIMARY KEY REFERENCES chatsessions(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL,
+    covered_until_at TIMESTAMP NOT NULL,
+    covered_until_id UUID NOT NULL,
+    covered_messages INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -1,28 +1,296 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
-from flask import g, current_app
+import psycopg2.extensions
+import psycopg2.pool
+from flask import g, current_app, has_app_context
 import logging
 from logging_config import app_logger, error_logger
 
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no pooled connection becomes available within the checkout timeout.
+    """
+    pass
+
+
+class PostgresConnectionPool:
+    """
+    Bounded PostgreSQL connection pool.
+    Uses threading primitives, which are green once eventlet.monkey_patch() has run,
+    so waiting for a connection parks the greenlet instead of blocking the hub.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=5.0,
+                 max_idle=300.0, max_lifetime=3600.0, health_check_after=5.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: require 0 <= minconn <= maxconn and maxconn >= 1")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (conn, created_at, returned_at), most recently returned on the right
+        self._created_at = {}  # id(conn) -> creation time
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'recycled': 0,
+            'failed_health_checks': 0,
+            'total_wait_seconds': 0.0
+        }
+
+        for _ in range(minconn):
+            conn = self._connect()
+            self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+
+    @property
+    def size(self):
+        return len(self._idle) + self._in_use
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        self._created_at[id(conn)] = time.monotonic()
+        self._counters['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        self._counters['discarded'] += 1
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception as e:
+            error_logger.error("Pool discard error: %s", e, exc_info=True)
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            app_logger.warning("Pool health check failed, discarding connection: %s", e)
+            return False
+
+    def _reap_idle(self):
+        """
+        Close idle connections past max_idle or max_lifetime, keeping minconn alive.
+        Must be called with the condition held.
+        """
+        now = time.monotonic()
+        kept = deque()
+        while self._idle:
+            conn, created_at, returned_at = self._idle.popleft()
+            expired = (now - created_at) > self.max_lifetime
+            stale = (now - returned_at) > self.max_idle and (len(kept) + len(self._idle) + self._in_use) >= self.minconn
+            if expired or stale:
+                self._counters['recycled'] += 1
+                self._discard(conn)
+            else:
+                kept.append((conn, created_at, returned_at))
+        self._idle = kept
+
+    def getconn(self, timeout=None):
+        """
+        Borrow a connection, waiting up to `timeout` seconds for one to free up.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("Connection pool is closed")
+                self._reap_idle()
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self.size < self.maxconn:
+                    # Reserve the slot before connecting so concurrent borrowers respect maxconn
+                    self._in_use += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(f"Timed out after {timeout}s waiting for a database connection")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, returned_at):
+                self._counters['failed_health_checks'] += 1
+                self._discard(conn)
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._counters['checkouts'] += 1
+            self._counters['total_wait_seconds'] += time.monotonic() - started
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Return a borrowed connection, rolling back any open transaction first.
+        """
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception as e:
+                app_logger.warning("Pool rollback on return failed, discarding connection: %s", e)
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                created_at = self._created_at.get(id(conn), time.monotonic())
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.popleft()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._counters['checkouts']
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'timeouts': self._counters['timeouts'],
+                'created': self._counters['created'],
+                'discarded': self._counters['discarded'],
+                'recycled': self._counters['recycled'],
+                'failed_health_checks': self._counters['failed_health_checks'],
+                'avg_wait_ms': round(self._counters['total_wait_seconds'] * 1000 / checkouts, 3) if checkouts else 0.0
+            }
+
+
+_pool = None
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it lazily from app config if needed.
+    """
+    global _pool
+    if _pool is None:
+        dsn = current_app.config['DATABASE_URL'] if has_app_context() else os.getenv('DATABASE_URL')
+        _pool = PostgresConnectionPool(
+            dsn,
+            minconn=int(os.getenv('DB_POOL_MIN', 1)),
+            maxconn=int(os.getenv('DB_POOL_MAX', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 5.0)),
+            max_idle=float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+            health_check_after=float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', 5.0))
+        )
+        app_logger.info("Database pool created (min=%s, max=%s)", _pool.minconn, _pool.maxconn)
+    return _pool
+
+
+def get_pool_stats():
+    try:
+        return get_pool().stats() if _pool is not None else {}
+    except Exception as e:
+        error_logger.error("get_pool_stats error: %s", e, exc_info=True)
+        return {}
+
+
 def get_db():
+    """
+    Returns the connection bound to the current app context, borrowing one from the pool on first use.
+    """
     try:
         if 'db' not in g:
-            g.db = psycopg2.connect(current_app.config['DATABASE_URL'])
+            g.db = get_pool().getconn()
         return g.db
     except Exception as e:
-        error_logger.error(f"get_db error: {e}", exc_info=True)
+        error_logger.error("get_db error: %s", e, exc_info=True)
         raise
 
+
 def close_db(e=None):
+    """
+    Returns the app context's connection to the pool (registered as teardown handler).
+    """
     try:
         db = g.pop('db', None)
         if db is not None:
-            db.close()
+            get_pool().putconn(db)
     except Exception as e:
-        error_logger.error(f"close_db error: {e}", exc_info=True)
+        error_logger.error("close_db error: %s", e, exc_info=True)
+
+
+def release_db():
+    """
+    Returns the connection early, e.g. before a socket handler waits on a slow upstream call.
+    A later get_db() in the same context borrows a fresh one.
+    """
+    close_db()
+
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled connection for code running outside any Flask app context
+    (background tasks, socket jobs spawned with start_background_task).
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
 
 def init_db(app):
     try:
         app.teardown_appcontext(close_db)
-        app_logger.info("Database teardown registered.")
+        with app.app_context():
+            get_pool()
+        app_logger.info("Database pool initialised and teardown registered.")
     except Exception as e:
-        error_logger.error(f"init_db error: {e}", exc_info=True)
\ No newline at end of file
+        error_logger.error("init_db error: %s", e, exc_info=True)
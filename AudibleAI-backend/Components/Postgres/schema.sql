@@ -13,7 +13,11 @@ CREATE TABLE IF NOT EXISTS chatsessions (
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     title VARCHAR(255) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    last_activity_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    last_activity_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Maintained by trg_messages_session_activity so the sidebar needs no per-session queries
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_preview VARCHAR(200),
+    last_message_sender VARCHAR(10)
 );
 
 CREATE TYPE sender_enum AS ENUM ('USER', 'AI', 'SYSTEM');
@@ -25,3 +29,46 @@ CREATE TABLE IF NOT EXISTS messages (
     text TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE TABLE IF NOT EXISTS message_audio (
+    message_id UUID PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+    content_hash CHAR(64) NOT NULL,
+    mime_type VARCHAR(64) NOT NULL,
+    byte_size INTEGER NOT NULL,
+    storage_path VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rolling summary of the turns older than the LLM context window; covers messages up to
+-- and including the (covered_until_at, covered_until_id) position
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id UUID PRIMARY KEY REFERENCES chatsessions(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL,
+    covered_until_at TIMESTAMP NOT NULL,
+    covered_until_id UUID NOT NULL,
+    covered_messages INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Keyset pagination of a session's history: WHERE session_id = ? AND (created_at, id) < (?, ?)
+CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages (session_id, created_at, id);
+
+-- Sidebar listing: a user's sessions by most recent activity, keyset-paginated on (last_activity_at, id)
+CREATE INDEX IF NOT EXISTS idx_chatsessions_user_activity ON chatsessions (user_id, last_activity_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION bump_session_activity() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE chatsessions
+    SET last_activity_at = NEW.created_at,
+        message_count = message_count + 1,
+        last_message_preview = LEFT(NEW.text, 200),
+        last_message_sender = NEW.sender::text
+    WHERE id = NEW.session_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_messages_session_activity ON messages;
+CREATE TRIGGER trg_messages_session_activity
+    AFTER INSERT ON messages
+    FOR EACH ROW EXECUTE FUNCTION bump_session_activity();
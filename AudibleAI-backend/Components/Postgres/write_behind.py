@@ -0,0 +1,123 @@
+import os
+import atexit
+import threading
+from collections import OrderedDict
+from psycopg2.extras import execute_batch
+from components.postgres.postgres_conn_utils import db_connection
+import logging
+from logging_config import app_logger, error_logger
+
+
+class GroupCommitWriter:
+    """
+    Background writer for non-critical updates (e.g. last_login_at).
+
+    Writes are queued under a key; a newer write with the same key replaces the pending
+    one. A background task drains the queue every `flush_interval` seconds (or as soon as
+    `batch_size` writes are pending) and applies the whole batch in a single transaction,
+    so many rows share one commit. Pending writes are flushed on close() and at exit.
+    """
+
+    def __init__(self, flush_interval=1.0, batch_size=500):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # key -> (sql, params)
+        self._closed = False
+        self._thread = None
+        self._flush_lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'coalesced': 0, 'written': 0, 'commits': 0, 'failed': 0}
+
+    def enqueue(self, key, sql, params):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter is closed")
+            if key in self._pending:
+                self._counters['coalesced'] += 1
+                del self._pending[key]
+            self._pending[key] = (sql, params)
+            self._counters['enqueued'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._closed and not self._pending:
+                    return
+            self.flush()
+
+    def flush(self):
+        """
+        Write everything pending in one transaction.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending.values())
+                self._pending.clear()
+            if not batch:
+                return 0
+            # Group identical statements so each group is sent with execute_batch
+            groups = OrderedDict()
+            for sql, params in batch:
+                groups.setdefault(sql, []).append(params)
+            try:
+                with db_connection() as conn:
+                    with conn.cursor() as cur:
+                        for sql, params_list in groups.items():
+                            execute_batch(cur, sql, params_list)
+                    conn.commit()
+                with self._cond:
+                    self._counters['written'] += len(batch)
+                    self._counters['commits'] += 1
+                app_logger.info("Group commit: wrote %s rows in one transaction", len(batch))
+                return len(batch)
+            except Exception as e:
+                with self._cond:
+                    self._counters['failed'] += len(batch)
+                error_logger.error("Group commit flush error (%s rows dropped): %s", len(batch), e, exc_info=True)
+                return 0
+
+    def close(self):
+        """
+        Stop accepting writes and flush whatever is still pending.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return {**self._counters, 'pending': len(self._pending)}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_write_behind():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter(
+                flush_interval=float(os.getenv('WRITE_BEHIND_FLUSH_MS', 1000)) / 1000.0,
+                batch_size=int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+            )
+            atexit.register(_writer.close)
+        return _writer
+
+
+def shutdown_write_behind():
+    """
+    Flush pending writes; call on graceful shutdown.
+    """
+    if _writer is not None:
+        _writer.close()
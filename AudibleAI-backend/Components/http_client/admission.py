@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import logging
+from logging_config import app_logger, error_logger
+
+
+class UpstreamBusy(Exception):
+    """
+    Raised when an upstream call is refused admission (queue full or deadline passed);
+    callers should answer "busy" right away instead of waiting on a timeout.
+    """
+    pass
+
+
+class AdmissionController:
+    """
+    Caps concurrent calls to one upstream (Gemini, TTS) so a traffic spike queues here
+    instead of getting everyone rate-limited by Google at once.
+
+    At most `max_concurrent` callers hold a permit; up to `max_queue` more wait for one.
+    A caller that finds the queue full, or is still waiting at its deadline (`max_wait`
+    seconds by default), is shed with UpstreamBusy. Threading primitives are green under
+    eventlet, so waiting parks only the calling greenlet.
+    """
+
+    def __init__(self, name, max_concurrent=16, max_queue=64, max_wait=5.0, wait_window=1024):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._waits = deque(maxlen=wait_window)
+        self._counters = {'admitted': 0, 'rejected_queue_full': 0, 'shed_deadline': 0, 'max_queue_depth': 0}
+
+    def _shed(self, reason, counter):
+        self._counters[counter] += 1
+        app_logger.warning("%s admission refused: %s (in_flight=%s, waiting=%s)", self.name, reason, self._in_flight, self._waiting)
+        raise UpstreamBusy(f"{self.name} is busy, please try again shortly")
+
+    def acquire(self, deadline=None):
+        """
+        Takes a permit or raises UpstreamBusy. deadline is a time.monotonic() value.
+        """
+        start = time.monotonic()
+        deadline = deadline if deadline is not None else start + self.max_wait
+        with self._cond:
+            if self._in_flight >= self.max_concurrent or self._waiting:
+                if self._waiting >= self.max_queue:
+                    self._shed('queue full', 'rejected_queue_full')
+                self._waiting += 1
+                self._counters['max_queue_depth'] = max(self._counters['max_queue_depth'], self._waiting)
+                try:
+                    admitted = self._cond.wait_for(
+                        lambda: self._in_flight < self.max_concurrent,
+                        max(0.0, deadline - time.monotonic())
+                    )
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    self._shed('deadline passed while queued', 'shed_deadline')
+            self._in_flight += 1
+            self._counters['admitted'] += 1
+            self._waits.append(time.monotonic() - start)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def permit(self, deadline=None):
+        self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            result = {
+                **self._counters,
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue
+            }
+        if waits:
+            result.update({
+                'wait_ms_p50': round(waits[len(waits) // 2] * 1000, 1),
+                'wait_ms_p95': round(waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000, 1),
+                'wait_ms_max': round(waits[-1] * 1000, 1)
+            })
+        return result
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission(name):
+    """
+    Returns the shared admission controller for an upstream, created on first use from
+    <NAME>_MAX_CONCURRENCY, <NAME>_QUEUE_SIZE and <NAME>_QUEUE_TIMEOUT_MS.
+    """
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            prefix = name.upper()
+            controller = AdmissionController(
+                name,
+                max_concurrent=int(os.getenv(f'{prefix}_MAX_CONCURRENCY', 16)),
+                max_queue=int(os.getenv(f'{prefix}_QUEUE_SIZE', 64)),
+                max_wait=float(os.getenv(f'{prefix}_QUEUE_TIMEOUT_MS', 5000)) / 1000.0
+            )
+            _controllers[name] = controller
+            app_logger.info("Admission control for '%s': %s concurrent, %s queued", name, controller.max_concurrent, controller.max_queue)
+        return controller
+
+
+def get_admission_stats():
+    try:
+        with _controllers_lock:
+            controllers = list(_controllers.values())
+        return {controller.name: controller.stats() for controller in controllers}
+    except Exception as e:
+        error_logger.error("get_admission_stats error: %s", e, exc_info=True)
+        return {}
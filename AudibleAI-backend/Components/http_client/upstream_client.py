@@ -0,0 +1,152 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+from logging_config import app_logger, error_logger
+from metrics import upstream_request_seconds, upstream_retries_total
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class UpstreamClient:
+    """
+    Shared HTTP client for one upstream API (Gemini, Google TTS).
+
+    Requests go through one requests.Session, so connections are pooled per host and
+    kept alive instead of paying DNS and TLS on every call. Every request has a connect
+    and a read timeout; for streamed responses the read timeout bounds the gap between
+    bytes, not the whole stream. Connection errors, timeouts and 429/5xx answers are
+    retried up to `max_retries` times with full-jitter exponential backoff (honouring
+    Retry-After); a streamed response is only retried before its body is handed out.
+    Latency is measured up to the response headers.
+    """
+
+    def __init__(self, name, pool_size=20, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=2, backoff_base=0.2, backoff_max=5.0, latency_window=1024):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        # Retries are handled below so they can be counted and jittered
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = {'requests': 0, 'retries': 0, 'errors': 0}
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, latency=None, error=False):
+        with self._lock:
+            self._counters['requests'] += 1
+            if error:
+                self._counters['errors'] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request with pooling, timeouts and retries. Returns the final response
+        (which may still be an error status once retries are exhausted); raises the last
+        connection error or timeout if every attempt failed at the transport level.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(error=True)
+                upstream_request_seconds.observe(time.monotonic() - start, upstream=self.name, status=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                app_logger.warning("%s request failed (%s), retrying in %.2fs", self.name, e, delay)
+            else:
+                latency = time.monotonic() - start
+                upstream_request_seconds.observe(latency, upstream=self.name, status=response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    self._record(latency)
+                    return response
+                self._record(latency, error=True)
+                if attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                app_logger.warning("%s returned %s, retrying in %.2fs", self.name, response.status_code, delay)
+                response.close()
+            with self._lock:
+                self._counters['retries'] += 1
+            upstream_retries_total.inc(upstream=self.name)
+            attempt += 1
+            time.sleep(delay)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = dict(self._counters)
+        result = {**counters, 'connect_timeout': self.timeout[0], 'read_timeout': self.timeout[1]}
+        if latencies:
+            def pct(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+            result.update({
+                'latency_ms_p50': pct(0.50),
+                'latency_ms_p95': pct(0.95),
+                'latency_ms_p99': pct(0.99),
+                'latency_ms_max': round(latencies[-1] * 1000, 1)
+            })
+        return result
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_upstream_client(name):
+    """
+    Returns the shared client for an upstream, created on first use from
+    <NAME>_CONNECT_TIMEOUT / <NAME>_READ_TIMEOUT and the UPSTREAM_* defaults.
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            prefix = name.upper()
+            client = UpstreamClient(
+                name,
+                pool_size=int(os.getenv('UPSTREAM_POOL_SIZE', 20)),
+                connect_timeout=float(os.getenv(f'{prefix}_CONNECT_TIMEOUT', os.getenv('UPSTREAM_CONNECT_TIMEOUT', 5))),
+                read_timeout=float(os.getenv(f'{prefix}_READ_TIMEOUT', os.getenv('UPSTREAM_READ_TIMEOUT', 60))),
+                max_retries=int(os.getenv('UPSTREAM_MAX_RETRIES', 2)),
+                backoff_base=float(os.getenv('UPSTREAM_BACKOFF_MS', 200)) / 1000.0,
+                backoff_max=float(os.getenv('UPSTREAM_BACKOFF_MAX_MS', 5000)) / 1000.0
+            )
+            _clients[name] = client
+            app_logger.info("Upstream client '%s' initialised (timeouts %s)", name, client.timeout)
+        return client
+
+
+def get_upstream_stats():
+    try:
+        with _clients_lock:
+            clients = list(_clients.values())
+        return {client.name: client.stats() for client in clients}
+    except Exception as e:
+        error_logger.error("get_upstream_stats error: %s", e, exc_info=True)
+        return {}
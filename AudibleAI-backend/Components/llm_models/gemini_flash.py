@@ -1,44 +1,132 @@
 
 import os
-import requests
+import json
+import time
 import logging
 from logging_config import app_logger, error_logger
+from components.http_client.upstream_client import get_upstream_client
+from components.http_client.admission import get_admission
+from metrics import llm_request_seconds
 
+GEMINI_MODEL = 'gemini-2.5-flash'
+# GEMINI_API_BASE can point at a local stub (see benchmarks/stub_upstreams.py)
+GEMINI_API_BASE = 'https://generativelanguage.googleapis.com/v1beta/models'
+
+class GeminiAPIError(Exception):
+    """
+    A streamed reply failed before any text was yielded.
+    """
+
+class GeminiStreamError(Exception):
+    """
+    A streamed reply broke off after part of it was yielded, so what arrived is not a complete answer.
+    """
+
+def build_gemini_payload(user_message, history=None, system_instruction=None):
+    """
+    Request body for generateContent. history is a list of {'role': 'user'|'model', 'text': ...}
+    turns sent before the new message; system_instruction carries e.g. the conversation summary.
+    """
+    contents = [{"role": turn['role'], "parts": [{"text": turn['text']}]} for turn in (history or [])]
+    contents.append({"role": "user", "parts": [{"text": user_message}]})
+    payload = {"contents": contents}
+    if system_instruction:
+        payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+    return payload
 
 def get_gemini_response(user_message):
     """
     Sends a chat message to Gemini 2.5 Flash API and returns the AI response text.
     """
     api_key = os.getenv('LLM_API_KEY')
-    endpoint = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent'
+    endpoint = f"{os.getenv('GEMINI_API_BASE', GEMINI_API_BASE)}/{GEMINI_MODEL}:generateContent"
     headers = {
         'Content-Type': 'application/json',
         'x-goog-api-key': api_key
     }
-    payload = {
-        "contents": [
-            {"role": "user", "parts": [{"text": user_message}]}
-        ]
-    }
+    payload = build_gemini_payload(user_message)
     try:
-        app_logger.info(f"Gemini API user message recieved")
-        response = requests.post(endpoint, json=payload, headers=headers)
+        app_logger.info("Gemini API user message recieved")
+        with get_admission('gemini').permit(), llm_request_seconds.time(call='generate'):
+            response = get_upstream_client('gemini').post(endpoint, json=payload, headers=headers)
         response.raise_for_status()
         data = response.json()
         ai_text = data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-        app_logger.info(f"Gemini API response generated")
+        app_logger.info("Gemini API response generated")
         return ai_text
     except Exception as e:
-        error_logger.error(f"Gemini API Error: {e}", exc_info=True)
+        error_logger.error("Gemini API Error: %s", e, exc_info=True)
         return f"[Gemini API Error]: {str(e)}"
 
-def get_gemini_response_stream(user_message, chunk_size=20):
+def get_gemini_response_stream(user_message, history=None, system_instruction=None, usage=None):
     """
-    Simulates streaming Gemini response by yielding chunks of text.
+    Streams the Gemini 2.5 Flash response via the streamGenerateContent SSE endpoint,
+    yielding text parts as soon as they arrive.
+    history/system_instruction: optional conversation context (see build_gemini_payload).
+    usage: optional dict filled with the token counts and finish reason Gemini reports.
+    Raises UpstreamBusy before the first chunk when admission control refuses the call,
+    GeminiAPIError when the request fails before any text was yielded, and GeminiStreamError
+    when the stream fails or ends without a finish reason after text was yielded.
     """
+    api_key = os.getenv('LLM_API_KEY')
+    endpoint = f"{os.getenv('GEMINI_API_BASE', GEMINI_API_BASE)}/{GEMINI_MODEL}:streamGenerateContent?alt=sse"
+    headers = {
+        'Content-Type': 'application/json',
+        'x-goog-api-key': api_key
+    }
+    payload = build_gemini_payload(user_message, history, system_instruction)
+    usage = usage if usage is not None else {}
+    # Raises UpstreamBusy to the caller (nothing has been streamed yet); the permit is held for the whole stream
+    admission = get_admission('gemini')
+    admission.acquire()
+    yielded = False
+    start = time.perf_counter()
     try:
-        full_text = get_gemini_response(user_message)
-        for i in range(0, len(full_text), chunk_size):
-            yield full_text[i:i+chunk_size]
+        app_logger.info("Gemini API stream user message recieved")
+        with get_upstream_client('gemini').post(endpoint, json=payload, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            for text in _iter_sse_text(response, usage):
+                yielded = True
+                yield text
+        if yielded and not usage.get('finish_reason'):
+            raise GeminiStreamError("stream ended without a finish reason")
+        if usage:
+            app_logger.info("Gemini API stream completed (prompt_tokens=%s, output_tokens=%s)", usage.get('prompt_tokens'), usage.get('output_tokens'))
+        else:
+            app_logger.info("Gemini API stream completed")
     except Exception as e:
-        error_logger.error(f"Gemini stream error: {e}", exc_info=True)
+        error_logger.error("Gemini stream error: %s", e, exc_info=True)
+        # Part of the reply is already out: the caller must not save it as a complete answer
+        if yielded:
+            raise GeminiStreamError(f"Gemini stream interrupted: {e}") from e
+        # Nothing was streamed: fail the reply rather than passing the error off as its text
+        raise GeminiAPIError(f"Gemini API error: {e}") from e
+    finally:
+        admission.release()
+        llm_request_seconds.observe(time.perf_counter() - start, call='stream')
+
+def _iter_sse_text(response, usage=None):
+    """
+    Parses `data: {...}` server-sent events and yields the text parts of each candidate.
+    The latest usageMetadata and finishReason seen are copied into `usage` when given.
+    """
+    for raw_line in response.iter_lines():
+        # SSE is always UTF-8; don't let requests guess from the content type
+        line = raw_line.decode('utf-8') if raw_line else ''
+        if not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if not data or data == '[DONE]':
+            continue
+        event = json.loads(data)
+        metadata = event.get('usageMetadata')
+        if usage is not None and metadata:
+            usage['prompt_tokens'] = metadata.get('promptTokenCount')
+            usage['output_tokens'] = metadata.get('candidatesTokenCount')
+        for candidate in event.get('candidates', [])[:1]:
+            if usage is not None and candidate.get('finishReason'):
+                usage['finish_reason'] = candidate['finishReason']
+            for part in candidate.get('content', {}).get('parts', []):
+                text = part.get('text')
+                if text:
+                    yield text
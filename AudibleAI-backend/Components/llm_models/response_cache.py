@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+from logging_config import app_logger, error_logger
+
+
+def normalize_prompt(prompt):
+    """
+    Case- and whitespace-insensitive form of a prompt, so "What is X?" and " what is  x?" share an entry.
+    """
+    return ' '.join(prompt.split()).casefold()
+
+
+def context_fingerprint(history=None, system_instruction=None):
+    """
+    Hash of everything sent alongside the prompt; an answer is only reused for the same context.
+    """
+    material = json.dumps({'history': history or [], 'system': system_instruction or ''}, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def llm_cache_key(prompt, model, fingerprint):
+    material = '\x1f'.join([normalize_prompt(prompt), model, fingerprint])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    In-memory LRU of complete LLM answers, stored as the original list of streamed chunks
+    so a hit can be replayed through the same emit path. Entries expire after `ttl`
+    seconds; the least recently used are evicted beyond `max_entries` or `max_bytes`.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=16 * 1024 * 1024, ttl=3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (chunks, size, expires_at)
+        self._bytes = 0
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[2]:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return list(entry[0])
+            if entry is not None:
+                self._drop(key)
+                self._counters['expired'] += 1
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key, chunks):
+        size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (tuple(chunks), size, time.monotonic() + self.ttl)
+            self._bytes += size
+            self._counters['stores'] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._counters['evictions'] += 1
+
+    def _drop(self, key):
+        """
+        Must be called with the lock held.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries), 'bytes': self._bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def is_llm_cache_enabled():
+    return os.getenv('LLM_CACHE', 'false').lower() in ('1', 'true', 'yes')
+
+
+def get_llm_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 1000)),
+                max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', 16)) * 1024 * 1024),
+                ttl=float(os.getenv('LLM_CACHE_TTL', 3600))
+            )
+            app_logger.info("LLM response cache initialised")
+        return _cache
+
+
+def get_llm_cache_stats():
+    try:
+        return get_llm_cache().stats()
+    except Exception as e:
+        error_logger.error("get_llm_cache_stats error: %s", e, exc_info=True)
+        return {}
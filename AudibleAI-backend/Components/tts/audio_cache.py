@@ -0,0 +1,191 @@
+import os
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+from logging_config import app_logger, error_logger
+from components.tts.google_chirp import (
+    generate_tts_audio, DEFAULT_VOICE, DEFAULT_RATE, DEFAULT_PITCH, AUDIO_ENCODING, AUDIO_MIME_TYPES
+)
+
+
+def tts_cache_key(clean_text, voice=None, speaking_rate=None, pitch=None, encoding=None, sample_rate=None):
+    """
+    Content address for synthesized audio. Settings are normalised the same way
+    generate_tts_audio applies its defaults, so "1.0", 1.0 and None share a key.
+    The default MP3 at the native rate keeps the key it had before encodings were selectable.
+    """
+    voice = voice or DEFAULT_VOICE
+    speaking_rate = float(speaking_rate or DEFAULT_RATE)
+    pitch = float(pitch or DEFAULT_PITCH)
+    encoding = encoding if encoding in AUDIO_MIME_TYPES else AUDIO_ENCODING
+    if sample_rate:
+        encoding = f"{encoding}@{int(sample_rate)}"
+    material = '\x1f'.join([clean_text, voice, repr(speaking_rate), repr(pitch), encoding])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class TTSAudioCache:
+    """
+    Two-tier cache for synthesized audio bytes: a bounded in-memory LRU in front of
+    an on-disk store that evicts least recently used files once it exceeds its size budget.
+    """
+
+    def __init__(self, cache_dir, memory_max_bytes, disk_max_bytes):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0
+        }
+        if disk_max_bytes > 0:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.audio'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, name[:-len('.audio')], st.st_size))
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def get(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return audio
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    audio = f.read()
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._counters['disk_hits'] += 1
+                self._put_memory(key, audio)
+                return audio
+            except OSError:
+                with self._lock:
+                    self._disk_bytes -= self._disk.pop(key, 0)
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    def put(self, key, audio):
+        self._put_memory(key, audio)
+        if self.disk_max_bytes <= 0 or len(audio) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            error_logger.error("TTS cache disk write error: %s", e, exc_info=True)
+            return
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            self._evict_disk()
+
+    def _put_memory(self, key, audio):
+        if len(audio) > self.memory_max_bytes:
+            return
+        with self._lock:
+            self._memory_bytes -= len(self._memory.pop(key, b''))
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._counters['memory_evictions'] += 1
+
+    def _evict_disk(self):
+        """
+        Must be called with the lock held.
+        """
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._counters['disk_evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'cache', 'tts')
+            _cache = TTSAudioCache(
+                cache_dir=os.getenv('TTS_CACHE_DIR', default_dir),
+                memory_max_bytes=int(float(os.getenv('TTS_CACHE_MEMORY_MB', 64)) * 1024 * 1024),
+                disk_max_bytes=int(float(os.getenv('TTS_CACHE_DISK_MB', 512)) * 1024 * 1024)
+            )
+            app_logger.info("TTS cache initialised at %s", _cache.cache_dir)
+        return _cache
+
+
+def get_tts_cache_stats():
+    try:
+        return get_tts_cache().stats()
+    except Exception as e:
+        error_logger.error("get_tts_cache_stats error: %s", e, exc_info=True)
+        return {}
+
+
+def get_tts_audio_bytes(clean_text, voice=None, speaking_rate=None, pitch=None, encoding=None, sample_rate=None):
+    """
+    Returns synthesized audio bytes for already-cleaned text, calling the TTS API only on a cache miss.
+    """
+    cache = get_tts_cache()
+    key = tts_cache_key(clean_text, voice, speaking_rate, pitch, encoding, sample_rate)
+    audio = cache.get(key)
+    if audio is not None:
+        app_logger.debug("TTS cache hit: %s", key[:12])
+        return audio
+    audio = base64.b64decode(generate_tts_audio(clean_text, voice, speaking_rate, pitch, encoding, sample_rate))
+    cache.put(key, audio)
+    return audio
@@ -0,0 +1,41 @@
+import os
+import hashlib
+import threading
+import logging
+from logging_config import app_logger
+
+AUDIO_EXTENSIONS = {
+    'audio/mpeg': 'mp3',
+    'audio/ogg': 'ogg'
+}
+
+
+def get_audio_store_dir():
+    default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'storage', 'audio')
+    store_dir = os.getenv('AUDIO_STORE_DIR', default_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    return store_dir
+
+
+def save_audio_blob(audio_bytes, mime_type='audio/mpeg'):
+    """
+    Writes audio to the content-addressed blob store (identical audio is stored once).
+    Returns (content_hash, file_name).
+    """
+    content_hash = hashlib.sha256(audio_bytes).hexdigest()
+    file_name = f"{content_hash}.{AUDIO_EXTENSIONS.get(mime_type, 'bin')}"
+    path = os.path.join(get_audio_store_dir(), file_name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio_bytes)
+        os.replace(tmp_path, path)
+        app_logger.info("Audio blob stored: %s (%s bytes)", file_name, len(audio_bytes))
+    return content_hash, file_name
+
+
+def audio_blob_path(file_name):
+    """
+    Absolute path of a stored blob; file names never contain directories.
+    """
+    return os.path.join(get_audio_store_dir(), os.path.basename(file_name))
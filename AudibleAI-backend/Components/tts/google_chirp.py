@@ -1,20 +1,42 @@
 import os
-import requests
 import logging
 from logging_config import app_logger, error_logger
+from components.http_client.upstream_client import get_upstream_client
+from components.http_client.admission import get_admission
+from metrics import tts_request_seconds
 
-def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch="0.0"):
+# Default voice settings
+DEFAULT_VOICE = "en-US-Wavenet-D"
+DEFAULT_RATE = 1.0
+DEFAULT_PITCH = 0.0
+AUDIO_ENCODING = "MP3"
+
+# Encodings clients can ask for, with the MIME type of the returned audio
+AUDIO_MIME_TYPES = {
+    "MP3": "audio/mpeg",
+    "OGG_OPUS": "audio/ogg"
+}
+# Separately synthesized clips that still play as one file when joined (MP3 is a plain frame
+# sequence; joined Ogg files form a chained stream that browsers' <audio> may stop playing after the first part)
+CONCATENABLE_ENCODINGS = {"MP3"}
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+def get_audio_mime_type(encoding=None):
+    return AUDIO_MIME_TYPES.get(encoding or AUDIO_ENCODING, AUDIO_MIME_TYPES[AUDIO_ENCODING])
+
+def get_audio_encoding(mime_type):
+    return next((e for e, m in AUDIO_MIME_TYPES.items() if m == mime_type), None)
+
+def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch="0.0", encoding=None, sample_rate=None):
     """
     Calls Google Chirp TTS API and returns audio content (base64).
+    encoding: one of AUDIO_MIME_TYPES (default MP3); sample_rate: output Hz, None keeps the voice's native rate.
+    The API has no bitrate setting; Opus and a lower sample rate are what shrink the audio.
     """
-    CHIRP_API_URL = "https://texttospeech.googleapis.com/v1/text:synthesize"  # Example endpoint
+    CHIRP_API_URL = os.getenv("TTS_API_URL", "https://texttospeech.googleapis.com/v1/text:synthesize")
     CHIRP_API_KEY = os.getenv("TTS_API_KEY")
 
-    # Default voice settings
-    DEFAULT_VOICE = "en-US-Wavenet-D"
-    DEFAULT_RATE = 1.0
-    DEFAULT_PITCH = 0.0
-
     if not voice:
         voice = DEFAULT_VOICE
 
@@ -24,6 +46,9 @@ def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch
     if not pitch:
         pitch = DEFAULT_PITCH
 
+    if encoding not in AUDIO_MIME_TYPES:
+        encoding = AUDIO_ENCODING
+
     if not CHIRP_API_KEY:
         raise ValueError("TTS_API_KEY is not set in environment variables.")
 
@@ -35,20 +60,23 @@ def generate_tts_audio(text, voice="en-US-Wavenet-D", speaking_rate="1.0", pitch
         "input": {"text": text},
         "voice": {"languageCode": voice.split('-')[0] + '-' + voice.split('-')[1], "name": voice},
         "audioConfig": {
-            "audioEncoding": "MP3",
+            "audioEncoding": encoding,
             "speakingRate": speaking_rate,
             "pitch": pitch
         }
     }
+    if sample_rate:
+        payload["audioConfig"]["sampleRateHertz"] = int(sample_rate)
 
     try:
-        app_logger.info(f"TTS request: text={text[:30]}... voice={voice} rate={speaking_rate} pitch={pitch}")
-        response = requests.post(CHIRP_API_URL, json=payload, headers=headers)
+        app_logger.info("TTS request: text=%s... voice=%s rate=%s pitch=%s encoding=%s sample_rate=%s", text[:30], voice, speaking_rate, pitch, encoding, sample_rate)
+        with get_admission('tts').permit(), tts_request_seconds.time():
+            response = get_upstream_client('tts').post(CHIRP_API_URL, json=payload, headers=headers)
         response.raise_for_status()
         audio_content_base64 = response.json().get("audioContent")
         if not audio_content_base64:
             raise ValueError("No audio content returned from TTS API.")
         return audio_content_base64  # base64-encoded string
     except Exception as e:
-        error_logger.error(f"TTS generation error: {e}", exc_info=True)
+        error_logger.error("TTS generation error: %s", e, exc_info=True)
         raise
@@ -0,0 +1,69 @@
+"""
+Microbenchmark for the markdown-to-speech normalizer.
+
+Compares the original per-call implementation (new parser, eleven str.replace passes)
+with the shared normalizer, cold (memo cleared) and warm (memo hit), in microseconds per KB.
+
+Run from AudibleAI-backend/:
+    python -m benchmarks.bench_text_processing [--repeat N]
+"""
+import re
+import time
+import argparse
+from markdown_it import MarkdownIt
+from mdit_plain.renderer import RendererPlain
+from monolithic.utils.text_processing import MarkdownSpeechNormalizer, SPOKEN_REPLACEMENTS
+
+SAMPLE_PARAGRAPH = (
+    "## Setting up the project\n\n"
+    "To install, run `pip install -r requirements.txt` and set **JWT_SECRET** in `.env`, "
+    "e.g. `JWT_SECRET=change-me`. Paths like src/app/main.py or C:\\Users\\me are read aloud, "
+    "i.e. every symbol is spoken. Compare a > b, a < b and x = {} or f() with [] etc.\n\n"
+    "- First item with *emphasis*\n"
+    "- Second item with a [link](https://example.com/docs)\n\n"
+    "```python\nprint('hello')\n```\n\n"
+)
+
+
+def legacy_clean_markdown_for_tts(markdown_text):
+    parser = MarkdownIt(renderer_cls=RendererPlain)
+    text = parser.render(markdown_text)
+    text = re.sub(r'\s+([.,!?])', r'\1', text)
+    for old, new in SPOKEN_REPLACEMENTS.items():
+        text = text.replace(old, new)
+    return ' '.join(text.split()).strip()
+
+
+def time_per_kb(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    elapsed = time.perf_counter() - start
+    kb = len(text.encode('utf-8')) / 1024.0
+    return elapsed / repeat / kb * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    normalizer = MarkdownSpeechNormalizer(cache_size=1024)
+
+    def cold(text):
+        normalizer._cached_normalize.cache_clear()
+        return normalizer.normalize(text)
+
+    print(f"{'size':>8} {'legacy us/KB':>14} {'cold us/KB':>12} {'warm us/KB':>12}")
+    for paragraphs in (1, 4, 16, 64):
+        text = SAMPLE_PARAGRAPH * paragraphs
+        assert legacy_clean_markdown_for_tts(text) == normalizer.normalize(text)
+        legacy = time_per_kb(legacy_clean_markdown_for_tts, text, args.repeat)
+        cold_cost = time_per_kb(cold, text, args.repeat)
+        warm = time_per_kb(normalizer.normalize, text, args.repeat)
+        size = f"{len(text.encode('utf-8')) / 1024.0:.1f}KB"
+        print(f"{size:>8} {legacy:>14.1f} {cold_cost:>12.1f} {warm:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""
+Socket.IO load generator: N simulated users chatting with one running backend.
+
+Each user registers and logs in through /auth, creates a session over REST, connects with its
+token, then sends `user:message` turns (optionally followed by `tts:start` replays) and records:
+    first_chunk_ms      user:message -> first ai:response:chunk
+    end_ms              user:message -> ai:response:end
+    first_audio_ms      user:message -> first auto-play tts:audio
+    audio_ready_ms      user:message -> auto-play tts:ready
+    chunk_gap_*_ms      gaps between consecutive ai:response:chunk frames (p95, max, stdev as jitter)
+    tts_first_audio_ms  tts:start -> first tts:audio, and tts_ready_ms -> tts:ready
+    audio_kb            auto-play tts:audio payload received, as sent on the wire (compare --audio-format)
+plus error codes from ai:response:error / tts:error and timeouts.
+
+Run it against stub upstreams so no API quota is spent. With --spawn-server it starts the stubs
+and server.py itself (DATABASE_URL and JWT_SECRET must still point at a real Postgres):
+    python -m benchmarks.load_socketio --spawn-server --clients 50 --messages 5 --tts --json out.json --csv out.csv
+or point it at a server already started with GEMINI_API_BASE/TTS_API_URL from benchmarks.stub_upstreams:
+    python -m benchmarks.load_socketio --url http://localhost:5000 --clients 50
+"""
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import statistics
+import threading
+import subprocess
+from datetime import datetime, timezone
+import jwt
+import requests
+import socketio
+from benchmarks.stub_upstreams import start_stub_server, add_config_arguments, config_from_args
+
+PROMPTS = (
+    "Explain how a hash map works in a few sentences.",
+    "Give me three tips for writing clear commit messages.",
+    "What is the difference between a process and a thread?",
+    "Summarize the plot of a heist movie you would write.",
+    "How do I make a good cup of pour-over coffee?"
+)
+
+ROW_FIELDS = (
+    'client', 'turn', 'ok', 'error', 'first_chunk_ms', 'end_ms', 'first_audio_ms', 'audio_ready_ms',
+    'chunks', 'chunk_gap_p95_ms', 'chunk_gap_max_ms', 'chunk_gap_stdev_ms', 'tts_first_audio_ms', 'tts_ready_ms',
+    'audio_kb'
+)
+SUMMARY_FIELDS = (
+    'first_chunk_ms', 'end_ms', 'first_audio_ms', 'audio_ready_ms',
+    'chunk_gap_p95_ms', 'chunk_gap_max_ms', 'chunk_gap_stdev_ms', 'tts_first_audio_ms', 'tts_ready_ms',
+    'audio_kb'
+)
+
+
+def _default_transport():
+    # The sync client's websocket transport needs the websocket-client package
+    try:
+        import websocket  # noqa: F401
+        return 'websocket'
+    except ImportError:
+        return 'polling'
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Turn:
+    """
+    Timestamps of one user:message (and its optional tts:start) as seen by the client.
+    """
+
+    def __init__(self):
+        self.sent_at = time.monotonic()
+        self.chunk_times = []
+        self.end_at = None
+        self.first_audio_at = None
+        self.audio_ready_at = None
+        self.audio_bytes = 0
+        self.error = None
+        self.ai_msg_id = None
+        self.ai_text = None
+        self.tts_sent_at = None
+        self.tts_first_audio_at = None
+        self.tts_ready_at = None
+        self.done = threading.Event()
+        self.audio_done = threading.Event()
+        self.tts_done = threading.Event()
+
+
+class SimulatedUser:
+    """
+    One user with its own account, session and Socket.IO connection. Server emits target the
+    user's room, so everything this connection receives belongs to its own turns.
+    """
+
+    def __init__(self, index, args, run_id):
+        self.index = index
+        self.args = args
+        self.email = f'load-{run_id}-{index}@example.invalid'
+        self.password = uuid.uuid4().hex
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=False)
+        self.turn = None
+        self.rows = []
+        self.sio.on('ai:response:chunk', self._on_chunk)
+        self.sio.on('ai:response:end', self._on_end)
+        self.sio.on('ai:response:error', self._on_response_error)
+        self.sio.on('tts:audio', self._on_audio)
+        self.sio.on('tts:ready', self._on_audio_ready)
+        self.sio.on('tts:error', self._on_tts_error)
+
+    # Socket handlers run on the client's own thread
+    def _on_chunk(self, data):
+        turn = self.turn
+        if turn:
+            turn.chunk_times.append(time.monotonic())
+
+    def _on_end(self, data):
+        turn = self.turn
+        if turn:
+            message = data.get('message') or {}
+            turn.ai_msg_id, turn.ai_text = message.get('id'), message.get('text')
+            turn.end_at = time.monotonic()
+            turn.done.set()
+
+    def _on_response_error(self, data):
+        turn = self.turn
+        if turn:
+            turn.error = data.get('code') or 'AI_ERROR'
+            turn.done.set()
+            turn.audio_done.set()
+
+    def _on_audio(self, data):
+        turn = self.turn
+        if not turn:
+            return
+        now = time.monotonic()
+        if data.get('autoPlay'):
+            turn.audio_bytes += len(data.get('bytes') or b'')
+            if turn.first_audio_at is None:
+                turn.first_audio_at = now
+        elif turn.tts_sent_at is not None and turn.tts_first_audio_at is None:
+            turn.tts_first_audio_at = now
+
+    def _on_audio_ready(self, data):
+        turn = self.turn
+        if not turn:
+            return
+        if data.get('autoPlay'):
+            turn.audio_ready_at = time.monotonic()
+            turn.audio_done.set()
+        elif turn.tts_sent_at is not None:
+            turn.tts_ready_at = time.monotonic()
+            turn.tts_done.set()
+
+    def _on_tts_error(self, data):
+        turn = self.turn
+        if not turn:
+            return
+        turn.error = turn.error or data.get('code') or 'TTS_ERROR'
+        if turn.tts_sent_at is not None:
+            turn.tts_done.set()
+        else:
+            turn.audio_done.set()
+
+    def setup(self):
+        base = self.args.url
+        response = self.http.post(f'{base}/auth/register', json={'email': self.email, 'password': self.password}, timeout=30)
+        response.raise_for_status()
+        response = self.http.post(f'{base}/auth/login', json={'email': self.email, 'password': self.password}, timeout=30)
+        response.raise_for_status()
+        self.token = response.json()['token']
+        self.user_id = jwt.decode(self.token, options={'verify_signature': False})['user_id']
+        self.http.headers['Authorization'] = f'Bearer {self.token}'
+        response = self.http.post(f'{base}/sessions', json={'title': f'Load test {self.index}'}, timeout=30)
+        response.raise_for_status()
+        self.session_id = response.json()['session_id']
+        self.sio.connect(base, auth={'token': self.token}, transports=[self.args.transport], wait_timeout=30)
+        self.sio.emit('user:join', {
+            'user_id': self.user_id,
+            'audioTransport': self.args.audio_transport,
+            'audioFormats': [self.args.audio_format]
+        })
+
+    def run_turn(self, turn_index):
+        args = self.args
+        turn = self.turn = Turn()
+        text = f'{random.choice(PROMPTS)} (user {self.index}, turn {turn_index})'
+        self.sio.emit('user:message', {
+            'session_id': self.session_id,
+            'user_id': self.user_id,
+            'text': text,
+            'is_first_message': turn_index == 0,
+            'noCache': not args.allow_cache
+        })
+        if not turn.done.wait(args.timeout):
+            turn.error = turn.error or 'TIMEOUT_RESPONSE'
+        elif not turn.error and not turn.audio_done.wait(args.timeout):
+            turn.error = 'TIMEOUT_AUDIO'
+        if args.tts and not turn.error and turn.ai_msg_id:
+            turn.tts_sent_at = time.monotonic()
+            self.sio.emit('tts:start', {'messageId': turn.ai_msg_id, 'text': turn.ai_text, 'userId': self.user_id})
+            if not turn.tts_done.wait(args.timeout):
+                turn.error = 'TIMEOUT_TTS'
+        self.turn = None
+        self.rows.append(self._row(turn_index, turn))
+
+    def _row(self, turn_index, turn):
+        gaps = [b - a for a, b in zip(turn.chunk_times, turn.chunk_times[1:])]
+        ordered = sorted(gaps)
+        since = lambda t, origin: _ms(t - origin) if t is not None and origin is not None else None
+        return {
+            'client': self.index,
+            'turn': turn_index,
+            'ok': turn.error is None,
+            'error': turn.error,
+            'first_chunk_ms': since(turn.chunk_times[0] if turn.chunk_times else None, turn.sent_at),
+            'end_ms': since(turn.end_at, turn.sent_at),
+            'first_audio_ms': since(turn.first_audio_at, turn.sent_at),
+            'audio_ready_ms': since(turn.audio_ready_at, turn.sent_at),
+            'chunks': len(turn.chunk_times),
+            'chunk_gap_p95_ms': _ms(_percentile(ordered, 0.95)) if ordered else None,
+            'chunk_gap_max_ms': _ms(ordered[-1]) if ordered else None,
+            'chunk_gap_stdev_ms': _ms(statistics.pstdev(gaps)) if len(gaps) > 1 else None,
+            'tts_first_audio_ms': since(turn.tts_first_audio_at, turn.tts_sent_at),
+            'tts_ready_ms': since(turn.tts_ready_at, turn.tts_sent_at),
+            'audio_kb': round(turn.audio_bytes / 1024, 1) if turn.first_audio_at is not None else None
+        }
+
+    def run(self, start_at):
+        delay = start_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            self.setup()
+        except Exception as e:
+            self.rows.append({'client': self.index, 'turn': -1, 'ok': False, 'error': f'SETUP: {e}'})
+            return
+        try:
+            for turn_index in range(self.args.messages):
+                self.run_turn(turn_index)
+                if self.args.think_time:
+                    time.sleep(random.uniform(0, 2 * self.args.think_time))
+        except Exception as e:
+            self.rows.append({'client': self.index, 'turn': len(self.rows), 'ok': False, 'error': f'CLIENT: {e}'})
+        finally:
+            self.sio.disconnect()
+
+
+def summarize(rows, elapsed):
+    turns = [row for row in rows if row['turn'] >= 0]
+    errors = {}
+    for row in rows:
+        if row['error']:
+            code = row['error'].split(':', 1)[0]
+            errors[code] = errors.get(code, 0) + 1
+    summary = {
+        'turns': len(turns),
+        'ok': sum(1 for row in turns if row['ok']),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 2),
+        'turns_per_s': round(len(turns) / elapsed, 2) if elapsed else None,
+        'metrics': {}
+    }
+    for field in SUMMARY_FIELDS:
+        values = sorted(row[field] for row in turns if row.get(field) is not None)
+        if values:
+            summary['metrics'][field] = {
+                'n': len(values),
+                'p50': _percentile(values, 0.50),
+                'p95': _percentile(values, 0.95),
+                'p99': _percentile(values, 0.99),
+                'max': values[-1],
+                'mean': round(statistics.fmean(values), 1)
+            }
+    return summary
+
+
+def spawn_server(args):
+    """
+    Starts the stub upstreams in-process and server.py as a child process pointed at them.
+    """
+    stubs = start_stub_server(config_from_args(args))
+    port = args.server_port
+    env = {**os.environ, **stubs.env(), 'PORT': str(port)}
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, 'server.py'], cwd=backend_dir, env=env)
+    args.url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server.py exited with code {process.returncode}')
+        try:
+            requests.get(f'{args.url}/health/db', timeout=1)
+            return stubs, process
+        except requests.RequestException:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError('server.py did not start listening within 30s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=3, help='user:message turns per client')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='seconds over which clients start')
+    parser.add_argument('--think-time', type=float, default=1.0, help='mean pause between turns (s)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-wait timeout (s)')
+    parser.add_argument('--tts', action='store_true', help='replay each answer with tts:start')
+    parser.add_argument('--allow-cache', action='store_true', help='let the LLM response cache answer')
+    parser.add_argument('--transport', choices=('websocket', 'polling'), default=_default_transport(),
+                        help='websocket needs `pip install websocket-client`; polling is used otherwise')
+    parser.add_argument('--audio-transport', choices=('base64', 'binary'), default='binary')
+    parser.add_argument('--audio-format', choices=('MP3', 'OGG_OPUS'), default='MP3', help='encoding announced on user:join')
+    parser.add_argument('--json', help='write summary and per-turn rows as JSON')
+    parser.add_argument('--csv', help='write per-turn rows as CSV')
+    parser.add_argument('--spawn-server', action='store_true', help='start stub upstreams and server.py')
+    parser.add_argument('--server-port', type=int, default=5055)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    stubs = process = None
+    if args.spawn_server:
+        stubs, process = spawn_server(args)
+    run_id = uuid.uuid4().hex[:8]
+    users = [SimulatedUser(i, args, run_id) for i in range(args.clients)]
+    started = time.monotonic()
+    threads = []
+    for user in users:
+        start_at = started + (args.ramp_up * user.index / max(1, args.clients - 1) if args.clients > 1 else 0)
+        thread = threading.Thread(target=user.run, args=(start_at,), name=f'load-user-{user.index}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        elapsed = time.monotonic() - started
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        if stubs is not None:
+            stubs.shutdown()
+
+    rows = [row for user in users for row in user.rows]
+    summary = summarize(rows, elapsed)
+    print(f"\n{summary['ok']}/{summary['turns']} turns ok in {summary['elapsed_s']}s ({summary['turns_per_s']} turns/s), errors: {summary['errors'] or 'none'}")
+    print(f"{'metric':<22} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for field, stats in summary['metrics'].items():
+        print(f"{field:<22} {stats['n']:>6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f}")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=ROW_FIELDS, restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        meta = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'args': {k: v for k, v in vars(args).items()}
+        }
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'summary': summary, 'rows': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Offline benchmark suite: hot-path microbenchmarks plus Gemini/TTS round trips against the
+local stub upstreams, written as a JSON report that can be compared with a previous run.
+
+Groups:
+    markdown  clean_markdown_for_tts, cold (unique input) and warm (memo hit)
+    audio     emit_audio_chunks as used by stream_tts_audio, base64 and binary transport
+    jwt       verify_jwt_token, first sight of a token and cached repeat
+    db        chat_queries functions against DATABASE_URL (skipped when it is unset)
+    upstream  get_gemini_response, get_gemini_response_stream and generate_tts_audio via the stubs
+
+Run from AudibleAI-backend/:
+    python -m benchmarks.run_benchmarks [--only markdown,jwt] [--output report.json]
+    python -m benchmarks.run_benchmarks --baseline report.json [--threshold 15] [--fail-on-regression]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from benchmarks.stub_upstreams import StubConfig, start_stub_server
+from benchmarks.bench_text_processing import SAMPLE_PARAGRAPH
+
+GROUPS = ('markdown', 'audio', 'jwt', 'db', 'upstream')
+
+# Stub shape for the upstream group: short delays so client-side overhead is visible
+BENCH_STUB_CONFIG = StubConfig(
+    latency_ms=20.0, jitter_ms=0.0, stream_chunks=20, chunk_delay_ms=2.0,
+    tts_latency_ms=20.0, tts_ms_per_char=0.0
+)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples):
+    """
+    Per-operation statistics in microseconds for a list of durations in seconds.
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        'n': len(ordered),
+        'mean_us': round(total / len(ordered) * 1e6, 2),
+        'p50_us': round(_percentile(ordered, 0.50) * 1e6, 2),
+        'p95_us': round(_percentile(ordered, 0.95) * 1e6, 2),
+        'p99_us': round(_percentile(ordered, 0.99) * 1e6, 2),
+        'max_us': round(ordered[-1] * 1e6, 2),
+        'ops_per_s': round(len(ordered) / total, 1) if total else None
+    }
+
+
+def measure(fn, iterations, warmup=None):
+    """
+    Times fn(i) for i in range(iterations) after a short warmup; fn gets the iteration index
+    so it can vary its input.
+    """
+    for i in range(warmup if warmup is not None else max(1, iterations // 10)):
+        fn(-1 - i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+class NullSocketIO:
+    """
+    Accepts emits without sending anything, so only the server-side cost is measured.
+    """
+
+    def __init__(self):
+        self.emits = 0
+
+    def emit(self, *args, **kwargs):
+        self.emits += 1
+
+
+def bench_markdown(iterations):
+    from monolithic.utils.text_processing import clean_markdown_for_tts
+    results = {}
+    for paragraphs in (1, 8):
+        text = SAMPLE_PARAGRAPH * paragraphs
+        label = f'{len(text.encode("utf-8")) // 1024 or 1}kb'
+        results[f'markdown.clean.cold.{label}'] = measure(lambda i: clean_markdown_for_tts(f'{text}{i}'), iterations)
+        results[f'markdown.clean.warm.{label}'] = measure(lambda i: clean_markdown_for_tts(text), iterations)
+    return results
+
+
+def bench_audio(iterations):
+    from monolithic.socket.client_prefs import set_client_prefs
+    from monolithic.socket.utils import emit_audio_chunks
+    socketio = NullSocketIO()
+    # ~30 s of speech at 32 kbps, as Google returns it (base64) and as stream_tts_audio sends it
+    audio_b64 = base64.b64encode(random.randbytes(120 * 1024)).decode('ascii')
+    results = {'audio.decode_base64.120kb': measure(lambda i: base64.b64decode(audio_b64), iterations)}
+    audio_bytes = base64.b64decode(audio_b64)
+    for transport in ('base64', 'binary'):
+        user_id = f'bench-{transport}'
+        set_client_prefs(user_id, 'bench-sid', audioTransport=transport)
+        results[f'audio.emit_chunks.{transport}.120kb'] = measure(
+            lambda i: emit_audio_chunks(socketio, user_id, 'bench-message', audio_bytes), iterations
+        )
+    return results
+
+
+def bench_jwt(iterations, app):
+    import jwt
+    from monolithic.utils.jwt_utils import verify_jwt_token
+    exp = time.time() + 3600
+    tokens = [
+        jwt.encode({'user_id': str(uuid.uuid4()), 'exp': exp, 'n': i}, app.config['SECRET_KEY'], algorithm='HS256')
+        for i in range(iterations + iterations // 10 + 1)
+    ]
+    repeated = tokens[0]
+    with app.app_context():
+        verify_jwt_token(repeated)
+        return {
+            'jwt.verify.first_seen': measure(lambda i: verify_jwt_token(tokens[i]), iterations),
+            'jwt.verify.cached': measure(lambda i: verify_jwt_token(repeated), iterations)
+        }
+
+
+def bench_db(iterations, app):
+    from components.postgres.postgres_conn_utils import init_db, get_db
+    from components.postgres.auth_queries import create_user_db
+    from components.postgres.chat_queries import (
+        create_session_db, add_turn_db, get_messages_db, get_messages_page_db,
+        get_sessions_page_db, get_session_summary_db, delete_session_db
+    )
+    init_db(app)
+    results = {}
+    with app.app_context():
+        user_id = create_user_db(f'bench-{uuid.uuid4().hex}@example.invalid', 'bench-not-a-real-hash')
+        if user_id is None:
+            raise RuntimeError('could not create a benchmark user; check DATABASE_URL and the schema')
+        sessions = []
+        try:
+            results['db.create_session_db'] = measure(
+                lambda i: sessions.append(create_session_db(user_id, f'Bench session {i}')), iterations
+            )
+            session_id = sessions[-1]
+            results['db.add_turn_db'] = measure(
+                lambda i: add_turn_db(session_id, f'Question {i}?', SAMPLE_PARAGRAPH), iterations
+            )
+            results['db.get_messages_page_db.50'] = measure(lambda i: get_messages_page_db(session_id, user_id, 50), iterations)
+            results['db.get_messages_db.all'] = measure(lambda i: get_messages_db(session_id, user_id), iterations)
+            results['db.get_sessions_page_db.20'] = measure(lambda i: get_sessions_page_db(user_id, 20), iterations)
+            results['db.get_session_summary_db'] = measure(lambda i: get_session_summary_db(session_id), iterations)
+        finally:
+            for session_id in filter(None, sessions):
+                delete_session_db(session_id, user_id)
+            db = get_db()
+            db.cursor().execute("DELETE FROM users WHERE id=%s", (user_id,))
+            db.commit()
+    return results
+
+
+def bench_upstream(iterations, stub_config):
+    from components.llm_models.gemini_flash import get_gemini_response, get_gemini_response_stream
+    from components.tts.google_chirp import generate_tts_audio
+    server = start_stub_server(stub_config)
+    os.environ.update(server.env())
+    first_chunk = []
+    total = []
+
+    def stream(i):
+        start = time.perf_counter()
+        first = None
+        for _chunk in get_gemini_response_stream(f'Benchmark question {i}'):
+            if first is None:
+                first = time.perf_counter() - start
+        first_chunk.append(first)
+        total.append(time.perf_counter() - start)
+
+    try:
+        results = {'upstream.gemini.generate': measure(lambda i: get_gemini_response(f'Benchmark question {i}'), iterations)}
+        stream(-1)
+        first_chunk.clear()
+        total.clear()
+        for i in range(iterations):
+            stream(i)
+        results['upstream.gemini.stream.first_chunk'] = summarize(first_chunk)
+        results['upstream.gemini.stream.total'] = summarize(total)
+        sentence = 'This is a typical sentence that the pipeline would synthesize on its own.'
+        results['upstream.tts.synthesize'] = measure(lambda i: base64.b64decode(generate_tts_audio(f'{sentence} {i}')), iterations)
+        results['upstream.stub_requests'] = dict(server.counters)
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(report, baseline, threshold):
+    """
+    Prints p50 changes against a baseline report and returns the names that got slower by more than threshold %.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<42} {'base p50us':>12} {'p50us':>12} {'change':>8}")
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'p50_us' not in result or not base.get('p50_us'):
+            continue
+        change = (result['p50_us'] - base['p50_us']) / base['p50_us'] * 100
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<42} {base['p50_us']:>12.1f} {result['p50_us']:>12.1f} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--only', default=','.join(GROUPS), help='comma-separated groups to run')
+    parser.add_argument('--iterations', type=int, default=500, help='iterations for in-process benchmarks')
+    parser.add_argument('--db-iterations', type=int, default=100)
+    parser.add_argument('--upstream-iterations', type=int, default=50)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='previous JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=15.0, help='p50 slowdown (%%) reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    from flask import Flask
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('JWT_SECRET') or 'benchmark-secret'
+    app.config['DATABASE_URL'] = os.getenv('DATABASE_URL')
+
+    groups = [g.strip() for g in args.only.split(',') if g.strip()]
+    runners = {
+        'markdown': lambda: bench_markdown(args.iterations),
+        'audio': lambda: bench_audio(args.iterations),
+        'jwt': lambda: bench_jwt(args.iterations, app),
+        'db': lambda: bench_db(args.db_iterations, app),
+        'upstream': lambda: bench_upstream(args.upstream_iterations, BENCH_STUB_CONFIG)
+    }
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'db_iterations': args.db_iterations,
+            'upstream_iterations': args.upstream_iterations,
+            'stub_config': vars(BENCH_STUB_CONFIG),
+            'skipped': {}
+        },
+        'results': {}
+    }
+    for group in groups:
+        if group not in runners:
+            parser.error(f"unknown group '{group}' (choose from {', '.join(GROUPS)})")
+        if group == 'db' and not app.config['DATABASE_URL']:
+            report['meta']['skipped'][group] = 'DATABASE_URL is not set'
+            print("db: skipped (DATABASE_URL is not set)")
+            continue
+        print(f"{group}: running...", flush=True)
+        try:
+            report['results'].update(runners[group]())
+        except Exception as e:
+            report['meta']['skipped'][group] = str(e)
+            print(f"{group}: failed ({e})")
+
+    print(f"\n{'benchmark':<42} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'ops/s':>10}")
+    for name, result in report['results'].items():
+        if 'p50_us' in result:
+            print(f"{name:<42} {result['p50_us']:>10.1f} {result['p95_us']:>10.1f} {result['p99_us']:>10.1f} {result['ops_per_s'] or 0:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0f}%")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
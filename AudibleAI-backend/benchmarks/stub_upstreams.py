@@ -0,0 +1,223 @@
+"""
+Local stand-ins for the Gemini and Google TTS endpoints, so the backend can be benchmarked
+and load-tested without spending API quota.
+
+Serves, on one port:
+    POST /v1beta/models/<model>:generateContent
+    POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+    POST /v1/text:synthesize
+
+Latency, stream shape, audio size and error rate are configurable. Failed requests answer
+503 (or 429), which the upstream client retries like the real thing.
+
+Run from AudibleAI-backend/ and point the server at it with the printed variables:
+    python -m benchmarks.stub_upstreams [--port 8090] [--latency-ms 300] [--error-rate 0.01]
+"""
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOREM = (
+    "Sure! Here is a **short** answer with a list:\n\n- First point, explained briefly.\n"
+    "- Second point, with `inline code` and a [link](https://example.com).\n\n"
+    "That should cover it. Let me know if you need more detail. "
+)
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 300.0  # time to first byte (Gemini) or to the whole response (TTS)
+    jitter_ms: float = 50.0
+    stream_chunks: int = 20
+    chunk_delay_ms: float = 40.0
+    chunk_chars: int = 60
+    tts_latency_ms: float = 250.0
+    tts_ms_per_char: float = 0.5
+    audio_bytes_per_char: int = 180  # ~MP3 at 32 kbps for average speech
+    opus_bytes_per_char: int = 70  # ~Ogg Opus for the same speech
+    error_rate: float = 0.0
+    rate_limit_share: float = 0.5  # fraction of injected errors that are 429 instead of 503
+
+
+def _sleep_ms(ms, jitter_ms=0.0):
+    delay = ms + (random.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+    if delay > 0:
+        time.sleep(delay / 1000.0)
+
+
+def _reply_text(chars):
+    text = LOREM * (chars // len(LOREM) + 1)
+    return text[:chars]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AudibleAIStub/1.0'
+    # Headers and body go out as separate writes; without this, delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'code': 400, 'message': 'Invalid JSON'}})
+        self.server.count('requests')
+        if random.random() < self.config.error_rate:
+            self.server.count('errors')
+            status = 429 if random.random() < self.config.rate_limit_share else 503
+            return self._send_json(status, {'error': {'code': status, 'message': 'Injected stub error'}}, {'Retry-After': '0'})
+
+        path = self.path.split('?', 1)[0]
+        if path.endswith(':streamGenerateContent'):
+            return self._stream_generate(body)
+        if path.endswith(':generateContent'):
+            return self._generate(body)
+        if path.endswith('text:synthesize'):
+            return self._synthesize(body)
+        self._send_json(404, {'error': {'code': 404, 'message': f'No stub for {path}'}})
+
+    def _prompt_tokens(self, body):
+        text = ''.join(part.get('text', '') for content in body.get('contents', []) for part in content.get('parts', []))
+        return max(1, len(text) // 4)
+
+    def _generate(self, body):
+        cfg = self.config
+        _sleep_ms(cfg.latency_ms + cfg.stream_chunks * cfg.chunk_delay_ms, cfg.jitter_ms)
+        text = _reply_text(cfg.stream_chunks * cfg.chunk_chars)
+        self._send_json(200, {
+            'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+            'usageMetadata': {'promptTokenCount': self._prompt_tokens(body), 'candidatesTokenCount': len(text) // 4}
+        })
+
+    def _stream_generate(self, body):
+        cfg = self.config
+        _sleep_ms(cfg.latency_ms, cfg.jitter_ms)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        text = _reply_text(cfg.stream_chunks * cfg.chunk_chars)
+        prompt_tokens = self._prompt_tokens(body)
+        try:
+            for i in range(cfg.stream_chunks):
+                if i:
+                    _sleep_ms(cfg.chunk_delay_ms)
+                last = i == cfg.stream_chunks - 1
+                candidate = {'content': {'role': 'model', 'parts': [{'text': text[i * cfg.chunk_chars:(i + 1) * cfg.chunk_chars]}]}}
+                event = {'candidates': [candidate]}
+                if last:
+                    candidate['finishReason'] = 'STOP'
+                    event['usageMetadata'] = {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': len(text) // 4}
+                self._write_chunk(f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8'))
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _synthesize(self, body):
+        cfg = self.config
+        text = body.get('input', {}).get('text', '')
+        _sleep_ms(cfg.tts_latency_ms + cfg.tts_ms_per_char * len(text), cfg.jitter_ms)
+        encoding = body.get('audioConfig', {}).get('audioEncoding')
+        per_char = cfg.opus_bytes_per_char if encoding == 'OGG_OPUS' else cfg.audio_bytes_per_char
+        audio = random.randbytes(max(1, len(text)) * per_char)
+        self._send_json(200, {'audioContent': base64.b64encode(audio).decode('ascii')})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def env(self):
+        """
+        Environment that points the backend's upstream calls at this stub.
+        """
+        return {
+            'GEMINI_API_BASE': f'{self.base_url}/v1beta/models',
+            'TTS_API_URL': f'{self.base_url}/v1/text:synthesize',
+            'LLM_API_KEY': 'stub-key',
+            'TTS_API_KEY': 'stub-key'
+        }
+
+
+def start_stub_server(config=None, host='127.0.0.1', port=0):
+    """
+    Starts the stubs on a daemon thread (port 0 picks a free port) and returns the server.
+    """
+    server = StubServer((host, port), config or StubConfig())
+    threading.Thread(target=server.serve_forever, name='stub-upstreams', daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser):
+    defaults = StubConfig()
+    for field, value in vars(defaults).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+
+
+def config_from_args(args):
+    return StubConfig(**{field: getattr(args, field) for field in vars(StubConfig())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), config_from_args(args))
+    print(f"Stub upstreams listening on {server.base_url}; start the backend with:")
+    for name, value in server.env().items():
+        print(f"  export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.counters['requests']} requests ({server.counters['errors']} injected errors)")
+
+
+if __name__ == '__main__':
+    main()
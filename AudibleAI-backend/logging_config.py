@@ -1,28 +1,203 @@
 import logging
+import logging.handlers
 import os
+import json
+import atexit
+import random
+from datetime import datetime, timezone
+from eventlet.patcher import original
+
+# eventlet.monkey_patch() turns threading and queue into green versions; the listener must be
+# a real OS thread so formatting, file writes and rotation never stall the hub
+_os_threading = original('threading')
+_os_queue = original('queue')
 
 # Ensure log directory exists
-LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+LOG_DIR = os.getenv('LOG_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs'))
 os.makedirs(LOG_DIR, exist_ok=True)
 
-APP_LOG_PATH = os.path.join(LOG_DIR, 'app.log')
-ERROR_LOG_PATH = os.path.join(LOG_DIR, 'error.log')
+# Workers started by run_workers.py get their own files; rotation is not multi-process safe
+WORKER_ID = os.getenv('WORKER_ID')
+_LOG_SUFFIX = f'.{WORKER_ID}' if WORKER_ID else ''
+APP_LOG_PATH = os.path.join(LOG_DIR, f'app{_LOG_SUFFIX}.log')
+ERROR_LOG_PATH = os.path.join(LOG_DIR, f'error{_LOG_SUFFIX}.log')
 
-# Log format includes file name
+# Text format (LOG_FORMAT=text) includes file name
 LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(filename)s]: %(message)s'
 
+# Per-record context fields picked up from the Flask request / socket event
+CONTEXT_FIELDS = ('request_id', 'user_id', 'session_id')
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with the request/user/session ids when the record has them.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'msg': record.getMessage()
+        }
+        if WORKER_ID:
+            entry['worker'] = WORKER_ID
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies request_id / user_id / session_id from flask.g onto the record, in the calling
+    thread, before the record is queued. Socket events fall back to the socket id.
+    """
+
+    def filter(self, record):
+        try:
+            from flask import g, has_request_context, request
+            if has_request_context():
+                record.request_id = g.get('request_id') or getattr(request, 'sid', None)
+                record.user_id = g.get('user_id')
+                record.session_id = g.get('log_session_id')
+        except Exception:
+            pass
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a `rate` fraction of records below WARNING; warnings and errors always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records without running the formatter; JSON encoding and file writes
+    happen in the listener. Only the %-interpolation and traceback text are resolved
+    here, since args and exc_info may not survive until the record is written.
+    Records are dropped (and counted) rather than blocking when the queue is full.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record):
+        # Never block or raise on the hot path; a full queue means the disk can't keep up
+        try:
+            self.queue.put_nowait(record)
+        except _os_queue.Full:
+            DeferredQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def set_log_context(**fields):
+    """
+    Attach ids (e.g. session_id) to every record logged for the rest of the current request or socket event.
+    """
+    try:
+        from flask import g, has_app_context
+        if has_app_context():
+            for field, value in fields.items():
+                setattr(g, 'log_session_id' if field == 'session_id' else field, value)
+    except Exception:
+        pass
+
+
+def _parse_sample_rates(spec):
+    """
+    'app_logger.db=0.1,app_logger.socket=0.5' -> {'app_logger.db': 0.1, 'app_logger.socket': 0.5}
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, rate = item.partition('=')
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+
+class ThreadQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener whose worker is an OS thread even when threading is monkey-patched.
+    """
+
+    def start(self):
+        self._thread = _os_threading.Thread(target=self._monitor, name='log-listener', daemon=True)
+        self._thread.start()
+
+
+def _file_handler(path, level, formatter):
+    handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=int(float(os.getenv('LOG_MAX_MB', 10)) * 1024 * 1024),
+        backupCount=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+        encoding='utf-8'
+    )
+    # Only the listener thread writes; a green lock would try to switch the hub from that thread
+    handler.lock = _os_threading.RLock()
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    return handler
+
+
+formatter = JsonFormatter() if os.getenv('LOG_FORMAT', 'json') == 'json' else logging.Formatter(LOG_FORMAT)
+
+# Callers only enqueue; a background listener formats and writes (app.log gets everything, error.log errors)
+log_queue = _os_queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+queue_handler = DeferredQueueHandler(log_queue)
+queue_handler.addFilter(ContextFilter())
+log_listener = ThreadQueueListener(
+    log_queue,
+    _file_handler(APP_LOG_PATH, logging.DEBUG, formatter),
+    _file_handler(ERROR_LOG_PATH, logging.ERROR, formatter),
+    respect_handler_level=True
+)
+
 # App logger (all logs)
 app_logger = logging.getLogger('app_logger')
-app_logger.setLevel(logging.INFO)
-app_handler = logging.FileHandler(APP_LOG_PATH)
-app_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+app_logger.setLevel(getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO))
+app_logger.propagate = False
 if not app_logger.hasHandlers():
-    app_logger.addHandler(app_handler)
+    app_logger.addHandler(queue_handler)
+
+# Per-query DB lines; sampled (LOG_SAMPLE_RATES) since they dominate log volume
+db_logger = logging.getLogger('app_logger.db')
 
 # Error logger (errors only)
 error_logger = logging.getLogger('error_logger')
 error_logger.setLevel(logging.ERROR)
-error_handler = logging.FileHandler(ERROR_LOG_PATH)
-error_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+error_logger.propagate = False
 if not error_logger.hasHandlers():
-    error_logger.addHandler(error_handler)
+    error_logger.addHandler(queue_handler)
+
+for _name, _rate in _parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', 'app_logger.db=0.1')).items():
+    if _rate < 1.0:
+        logging.getLogger(_name).addFilter(SamplingFilter(_rate))
+
+log_listener.start()
+# Drain whatever is still queued on exit
+atexit.register(log_listener.stop)
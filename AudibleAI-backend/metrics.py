@@ -0,0 +1,194 @@
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond DB/markdown work up to long LLM streams
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if not isinstance(value, int) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for key, value in values:
+            lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a dict lookup, a bisect and three increments under
+    a lock; cumulative bucket counts are only computed when /metrics is scraped.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [per-bucket counts (+inf last), sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            snapshot = [(key, list(s[0]), s[1], s[2]) for key, s in self._series.items()]
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class StatsCollector:
+    """
+    Exposes an existing stats() dict as gauges at scrape time, e.g. pool or cache counters.
+    Nested {name: {...}} dicts (per upstream) become a `label` label.
+    """
+
+    def __init__(self, prefix, stats_fn, label=None):
+        self.prefix = prefix
+        self.stats_fn = stats_fn
+        self.label = label
+
+    def render(self):
+        stats = self.stats_fn() or {}
+        rows = {}
+        if self.label:
+            for label_value, values in stats.items():
+                for field, value in (values or {}).items():
+                    rows.setdefault(field, []).append(((label_value,), value))
+        else:
+            for field, value in stats.items():
+                rows.setdefault(field, []).append(((), value))
+        lines = []
+        labelnames = (self.label,) if self.label else ()
+        for field, samples in rows.items():
+            samples = [(key, value) for key, value in samples
+                       if isinstance(value, (int, float)) and not isinstance(value, bool)]
+            if not samples:
+                continue
+            name = f'{self.prefix}_{field}'
+            lines.append(f'# TYPE {name} gauge')
+            for key, value in samples:
+                lines.append(f'{name}{_labels(labelnames, key)} {_number(value)}')
+        return lines
+
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def register_stats(prefix, stats_fn, label=None):
+    return _register(StatsCollector(prefix, stats_fn, label))
+
+
+def render_metrics():
+    """
+    Prometheus text exposition format (version 0.0.4) for every registered metric.
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception:
+            # One broken collector must not take the whole scrape down
+            continue
+    return '\n'.join(lines) + '\n'
+
+
+# Shared instruments, imported by the modules they measure
+db_query_seconds = histogram('audibleai_db_query_seconds', 'Duration of *_db query functions', ['function'])
+upstream_request_seconds = histogram('audibleai_upstream_request_seconds', 'Upstream HTTP time to response headers per attempt', ['upstream', 'status'])
+upstream_retries_total = counter('audibleai_upstream_retries_total', 'Upstream HTTP retries', ['upstream'])
+llm_request_seconds = histogram('audibleai_llm_request_seconds', 'Gemini call duration, full stream for streaming calls', ['call'])
+tts_request_seconds = histogram('audibleai_tts_request_seconds', 'Google TTS synthesis call duration')
+markdown_clean_seconds = histogram('audibleai_markdown_clean_seconds', 'Markdown-to-speech normalisation time', buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
+socket_emit_seconds = histogram('audibleai_socket_emit_seconds', 'Time spent in socketio.emit', ['event'])
+time_to_first_text_seconds = histogram('audibleai_time_to_first_text_seconds', 'user:message received to first ai:response:chunk emitted')
+time_to_first_audio_seconds = histogram('audibleai_time_to_first_audio_seconds', 'user:message received to first tts:audio chunk emitted')
+
+
+def timed_db(fn):
+    """
+    Records the duration of a *_db function under its name.
+    """
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db_query_seconds.observe(time.perf_counter() - start, function=name)
+    return wrapper
@@ -1,7 +1,7 @@
 
-from flask import request, jsonify
+from flask import request, jsonify, g
 from monolithic.services.auth_service import register_user, login_user, logout_user
-from monolithic.utils.jwt_utils import get_jwt_user_id
+from monolithic.utils.jwt_utils import require_auth
 import logging
 from logging_config import app_logger, error_logger
 
@@ -10,11 +10,11 @@ def register():
         data = request.json
         email = data.get('email')
         password = data.get('password')
-        app_logger.info(f"Register attempt for email: {email}")
+        app_logger.info("Register attempt for email: %s", email)
         result, status = register_user(email, password)
         return jsonify(result), status
     except Exception as e:
-        error_logger.error(f"Register error: {e}", exc_info=True)
+        error_logger.error("Register error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 def login():
@@ -22,32 +22,30 @@ def login():
         data = request.json
         email = data.get('email')
         password = data.get('password')
-        app_logger.info(f"Login attempt for email: {email}")
+        app_logger.info("Login attempt for email: %s", email)
         result, status = login_user(email, password)
         return jsonify(result), status
     except Exception as e:
-        error_logger.error(f"Login error: {e}", exc_info=True)
+        error_logger.error("Login error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 def logout():
     try:
         token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        app_logger.info(f"Logout attempt with token: {token}")
+        # Never log the token itself
+        app_logger.info("Logout attempt")
         result, status = logout_user(token)
         return jsonify(result), status
     except Exception as e:
-        error_logger.error(f"Logout error: {e}", exc_info=True)
+        error_logger.error("Logout error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@require_auth
 def verify_jwt():
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = get_jwt_user_id(request)
-        if not user_id:
-            app_logger.warning("user_id not found in token")
-            return jsonify({'error': 'user_id not found in token'}), 400
-        app_logger.info(f"JWT verified for user_id: {user_id}")
+        user_id = g.user_id
+        app_logger.info("JWT verified for user_id: %s", user_id)
         return jsonify({'user_id': user_id}), 200
     except Exception as e:
-        error_logger.error(f"JWT verify error: {e}", exc_info=True)
+        error_logger.error("JWT verify error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,78 +1,127 @@
-from flask import request, jsonify
+import os
+from flask import request, jsonify, send_file, g
 from monolithic.services.chat_service import (
-    list_sessions, create_new_session, list_messages, handle_user_message,
+    list_sessions, list_sessions_page, create_new_session, list_messages, list_messages_page, handle_user_message,
     delete_session, update_session_title
 )
-from monolithic.utils.jwt_utils import get_jwt_user_id
+from monolithic.services.audio_service import get_message_audio
+from monolithic.utils.jwt_utils import require_auth
+from monolithic.utils.pagination import parse_page_limit
 import logging
 from logging_config import app_logger, error_logger
 
+@require_auth
 def get_sessions():
     try:
-        user_id = get_jwt_user_id(request)
-        app_logger.info(f"Get sessions for user_id: {user_id}")
-        return jsonify(list_sessions(user_id)), 200
+        user_id = g.user_id
+        app_logger.info("Get sessions for user_id: %s", user_id)
+        # Without pagination params all sessions are returned as a plain list, as before
+        if not any(k in request.args for k in ('limit', 'before')):
+            return jsonify(list_sessions(user_id)), 200
+        limit = parse_page_limit(request.args.get('limit'), default=int(os.getenv('SESSIONS_PAGE_SIZE', 30)))
+        return jsonify(list_sessions_page(user_id, limit, before=request.args.get('before'))), 200
+    except ValueError as e:
+        app_logger.warning("Get sessions bad request: %s", e)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        error_logger.error(f"Get sessions error: {e}", exc_info=True)
+        error_logger.error("Get sessions error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@require_auth
 def create_session():
     try:
-        user_id = get_jwt_user_id(request)
+        user_id = g.user_id
         title = request.json.get('title', 'New Chat')
-        app_logger.info(f"Create session for user_id: {user_id}, title: {title}")
+        app_logger.info("Create session for user_id: %s, title: %s", user_id, title)
         session_id = create_new_session(user_id, title)
         return jsonify({'session_id': session_id}), 201
     except Exception as e:
-        error_logger.error(f"Create session error: {e}", exc_info=True)
+        error_logger.error("Create session error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@require_auth
 def get_messages(session_id):
     try:
-        user_id = get_jwt_user_id(request)
-        app_logger.info(f"Get messages for session_id: {session_id}, user_id: {user_id}")
-        return jsonify(list_messages(session_id, user_id)), 200
+        user_id = g.user_id
+        app_logger.info("Get messages for session_id: %s, user_id: %s", session_id, user_id)
+        args = request.args
+        # Without pagination params the full history is returned as a plain list, as before
+        if not any(k in args for k in ('limit', 'before', 'after')):
+            return jsonify(list_messages(session_id, user_id)), 200
+        if args.get('before') and args.get('after'):
+            return jsonify({'error': 'Use either before or after, not both'}), 400
+        limit = parse_page_limit(args.get('limit'), default=int(os.getenv('MESSAGES_PAGE_SIZE', 50)))
+        page = list_messages_page(session_id, user_id, limit, before=args.get('before'), after=args.get('after'))
+        return jsonify(page), 200
+    except ValueError as e:
+        app_logger.warning("Get messages bad request: %s", e)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        error_logger.error(f"Get messages error: {e}", exc_info=True)
+        error_logger.error("Get messages error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@require_auth
+def get_message_audio_route(session_id, message_id):
+    try:
+        user_id = g.user_id
+        app_logger.info("Get audio for message_id: %s, session_id: %s, user_id: %s", message_id, session_id, user_id)
+        audio = get_message_audio(session_id, message_id, user_id)
+        if not audio:
+            return jsonify({'error': 'Audio not found'}), 404
+        path, mime_type, etag = audio
+        # conditional=True answers Range requests with 206 and If-None-Match with 304
+        response = send_file(path, mimetype=mime_type, conditional=True, etag=etag, max_age=31536000)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+    except FileNotFoundError:
+        error_logger.error("Audio blob missing for message_id: %s", message_id)
+        return jsonify({'error': 'Audio not found'}), 404
+    except Exception as e:
+        error_logger.error("Get message audio error: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@require_auth
 def send_message(session_id):
     try:
-        user_id = get_jwt_user_id(request)
+        user_id = g.user_id
         text = request.json.get('text')
-        app_logger.info(f"Send message for session_id: {session_id}, user_id: {user_id}")
+        app_logger.info("Send message for session_id: %s, user_id: %s", session_id, user_id)
         msg = handle_user_message(session_id, user_id, text)
         return jsonify(msg), 201
     except Exception as e:
-        error_logger.error(f"Send message error: {e}", exc_info=True)
+        error_logger.error("Send message error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@require_auth
 def delete_session_route(session_id):
     try:
-        user_id = get_jwt_user_id(request)
-        app_logger.info(f"Delete session {session_id} for user_id: {user_id}")
+        user_id = g.user_id
+        app_logger.info("Delete session %s for user_id: %s", session_id, user_id)
         success = delete_session(session_id, user_id)
         if success:
             return jsonify({'message': 'Session deleted'}), 200
         else:
             return jsonify({'error': 'Session not found or not authorized'}), 404
     except Exception as e:
-        error_logger.error(f"Delete session error: {e}", exc_info=True)
+        error_logger.error("Delete session error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@require_auth
 def update_session_title_route(session_id):
     try:
-        user_id = get_jwt_user_id(request)
+        user_id = g.user_id
         new_title = request.json.get('title')
         if not new_title:
             app_logger.warning("Missing title for session title update")
             return jsonify({'error': 'Missing title'}), 400
-        app_logger.info(f"Update session title for session_id: {session_id}, user_id: {user_id}, new_title: {new_title}")
+        app_logger.info("Update session title for session_id: %s, user_id: %s, new_title: %s", session_id, user_id, new_title)
         success = update_session_title(session_id, user_id, new_title)
         if success:
             return jsonify({'message': 'Session title updated'}), 200
         else:
             return jsonify({'error': 'Session not found or not authorized'}), 404
     except Exception as e:
-        error_logger.error(f"Update session title error: {e}", exc_info=True)
+        error_logger.error("Update session title error: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,7 +1,7 @@
 from flask import Blueprint
 from monolithic.controllers.chat_controller import (
     get_sessions, create_session, get_messages, send_message,
-    delete_session_route, update_session_title_route
+    delete_session_route, update_session_title_route, get_message_audio_route
 )
 
 chat_bp = Blueprint('chat', __name__)
@@ -11,4 +11,5 @@ chat_bp.route('/sessions', methods=['POST'])(create_session)
 chat_bp.route('/sessions/<session_id>', methods=['DELETE'])(delete_session_route)
 chat_bp.route('/sessions/<session_id>', methods=['PATCH'])(update_session_title_route)
 chat_bp.route('/sessions/<session_id>/messages', methods=['GET'])(get_messages)
-chat_bp.route('/sessions/<session_id>/messages', methods=['POST'])(send_message)
\ No newline at end of file
+chat_bp.route('/sessions/<session_id>/messages', methods=['POST'])(send_message)
+chat_bp.route('/sessions/<session_id>/messages/<message_id>/audio', methods=['GET'])(get_message_audio_route)
\ No newline at end of file
@@ -0,0 +1,56 @@
+from components.postgres.audio_queries import save_message_audio_db, get_message_audio_db, get_user_message_audio_db
+from components.tts.audio_store import save_audio_blob, audio_blob_path
+import uuid
+import logging
+from logging_config import app_logger, error_logger
+
+def store_message_audio(message_id, audio_bytes, mime_type='audio/mpeg'):
+    """
+    Persists synthesized audio for a message so history reloads can play it without re-synthesis.
+    """
+    try:
+        if not message_id or not audio_bytes:
+            return False
+        try:
+            uuid.UUID(str(message_id))
+        except ValueError:
+            # Client-side placeholder ids (not yet persisted messages) have nothing to attach to
+            return False
+        content_hash, file_name = save_audio_blob(audio_bytes, mime_type)
+        return save_message_audio_db(message_id, content_hash, mime_type, len(audio_bytes), file_name)
+    except Exception as e:
+        error_logger.error("store_message_audio error: %s", e, exc_info=True)
+        return False
+
+def get_message_audio(session_id, message_id, user_id):
+    """
+    Returns (path, mime_type, etag) for a stored message audio owned by the user, or None.
+    """
+    try:
+        app_logger.info("Getting audio for message_id: %s, user_id: %s", message_id, user_id)
+        audio = get_message_audio_db(session_id, message_id, user_id)
+        if not audio:
+            return None
+        return audio_blob_path(audio['storage_path']), audio['mime_type'], audio['content_hash']
+    except Exception as e:
+        error_logger.error("get_message_audio error: %s", e, exc_info=True)
+        return None
+
+def load_user_message_audio(message_id, user_id):
+    """
+    Returns (audio_bytes, mime_type) of the stored audio of a message owned by the user, or None.
+    Lets tts:start replay a reply's audio without synthesizing it again.
+    """
+    try:
+        try:
+            uuid.UUID(str(message_id))
+        except ValueError:
+            return None
+        audio = get_user_message_audio_db(message_id, user_id)
+        if not audio:
+            return None
+        with open(audio_blob_path(audio['storage_path']), 'rb') as f:
+            return f.read(), audio['mime_type']
+    except Exception as e:
+        error_logger.error("load_user_message_audio error: %s", e, exc_info=True)
+        return None
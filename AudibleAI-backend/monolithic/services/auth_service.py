@@ -1,13 +1,14 @@
 import datetime
 import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask import current_app, request
 from components.postgres.auth_queries import (
     get_user_by_email_db,
     user_exists_db,
     create_user_db,
-    update_last_login_db
+    update_last_login_db,
+    update_password_hash_db
 )
+from monolithic.utils.password_hashing import password_hasher, needs_rehash, PasswordHasherBusy
 import logging
 from logging_config import app_logger, error_logger
 
@@ -17,43 +18,50 @@ def register_user(email, password):
             app_logger.warning("Missing email or password in register_user")
             return {'error': 'Missing email or password'}, 400
         if user_exists_db(email):
-            app_logger.warning(f"Email already registered: {email}")
+            app_logger.warning("Email already registered: %s", email)
             return {'error': 'Email already registered'}, 409
-        password_hash = generate_password_hash(password)
+        password_hash = password_hasher.hash_password(password)
         user_id = create_user_db(email, password_hash)
         token = jwt.encode({
             'user_id': user_id,
             'exp': (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=24)).timestamp()
         }, current_app.config['SECRET_KEY'], algorithm='HS256')
         update_last_login_db(user_id)
-        app_logger.info(f"User registered: {email}, user_id: {user_id}")
+        app_logger.info("User registered: %s, user_id: %s", email, user_id)
         return {'message': 'User registered and logged in successfully', 'token': token, 'user_id': user_id}, 201
+    except PasswordHasherBusy:
+        return {'error': 'Server busy, please retry'}, 503
     except Exception as e:
-        error_logger.error(f"register_user error: {e}", exc_info=True)
+        error_logger.error("register_user error: %s", e, exc_info=True)
         return {'error': str(e)}, 500
 
 def login_user(email, password):
     try:
         user = get_user_by_email_db(email)
-        if not user or not check_password_hash(user[1], password):
-            app_logger.warning(f"Invalid login credentials for email: {email}")
+        if not user or not password_hasher.verify_password(user[1], password):
+            app_logger.warning("Invalid login credentials for email: %s", email)
             return {'error': 'Invalid credentials'}, 401
+        if needs_rehash(user[1]):
+            # Hash parameters changed since this password was stored; upgrade it while we have the plaintext
+            update_password_hash_db(user[0], password_hasher.hash_password(password))
         token = jwt.encode({
             'user_id': user[0],
             'exp': (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=24)).timestamp()
         }, current_app.config['SECRET_KEY'], algorithm='HS256')
         update_last_login_db(user[0])
-        app_logger.info(f"User logged in: {email}, user_id: {user[0]}")
+        app_logger.info("User logged in: %s, user_id: %s", email, user[0])
         return {'token': token}, 200
+    except PasswordHasherBusy:
+        return {'error': 'Server busy, please retry'}, 503
     except Exception as e:
-        error_logger.error(f"login_user error: {e}", exc_info=True)
+        error_logger.error("login_user error: %s", e, exc_info=True)
         return {'error': str(e)}, 500
 
 def logout_user(token):
     try:
-        app_logger.info(f"Logout called for token: {token}")
+        app_logger.info("Logout called")
         # JWT is stateless; client should delete token
         return {'message': 'Logged out'}, 200
     except Exception as e:
-        error_logger.error(f"logout_user error: {e}", exc_info=True)
+        error_logger.error("logout_user error: %s", e, exc_info=True)
         return {'error': str(e)}, 500
\ No newline at end of file
@@ -1,86 +1,258 @@
-import sys
+import os
+from flask import current_app
 from components.postgres.chat_queries import (
     get_sessions_db,
+    get_sessions_page_db,
     create_session_db,
     get_messages_db,
-    add_user_message_db,
-    add_ai_message_db,
+    get_messages_page_db,
+    is_session_owner_db,
+    add_turn_db,
     delete_session_db,
     update_session_title_db
 )
-from components.llm_models.gemini_flash import get_gemini_response_stream, get_gemini_response
+from components.postgres.postgres_conn_utils import release_db
+from monolithic.utils.pagination import encode_cursor, decode_cursor
+from monolithic.utils.text_processing import heuristic_title
+from monolithic.utils.worker_pool import BoundedWorkerPool
+from monolithic.socket.emitter import emit_to_user
+from monolithic.services.context_service import build_conversation_context, empty_context, schedule_summary_refresh
+from components.llm_models.gemini_flash import get_gemini_response_stream, get_gemini_response, GEMINI_MODEL, GeminiAPIError, GeminiStreamError
+from components.http_client.admission import UpstreamBusy
+from components.llm_models.response_cache import (
+    is_llm_cache_enabled, get_llm_cache, llm_cache_key, context_fingerprint
+)
 import logging
 from logging_config import app_logger, error_logger
 
+# Title jobs call the LLM; cap them so they can never crowd out chat traffic
+title_pool = BoundedWorkerPool(
+    'title-generation',
+    max_workers=int(os.getenv('TITLE_WORKERS', 2)),
+    max_queue=int(os.getenv('TITLE_QUEUE_SIZE', 100))
+)
+
+def _emit_title_update(session_id, user_id, title):
+    emit_to_user('session:title:update', {
+        'session_id': session_id,
+        'title': title
+    }, user_id)
+
+def _generate_session_title(app, session_id, user_id, ai_text, placeholder):
+    """
+    Background job: ask the LLM for a title to replace the stored placeholder.
+    """
+    with app.app_context():
+        prompt = f"Generate strictly only one concise chat title, 3-4 words only, plain text, no symbols for this conversation: {ai_text}"
+        new_title = get_gemini_response(prompt).strip().strip('"\'')[:255]
+        if not new_title or new_title.startswith('[Gemini API Error]') or new_title == placeholder:
+            return
+        update_session_title_db(session_id, user_id, new_title)
+        _emit_title_update(session_id, user_id, new_title)
+        app_logger.info("Session title generated for session_id: %s", session_id)
+
+def _stream_reply(text, context, usage, use_cache=True):
+    """
+    Yields the reply chunks for a prompt, from the exact-match response cache when possible.
+    Only answers Gemini finished normally (finishReason STOP) are cached; usage['cached'] marks a hit.
+    """
+    history, system_instruction = context['history'], context['system_instruction']
+    if not (use_cache and is_llm_cache_enabled()):
+        yield from get_gemini_response_stream(text, history, system_instruction, usage)
+        return
+    cache = get_llm_cache()
+    key = llm_cache_key(text, GEMINI_MODEL, context_fingerprint(history, system_instruction))
+    cached_chunks = cache.get(key)
+    if cached_chunks is not None:
+        usage['cached'] = True
+        app_logger.info("LLM cache hit: %s", key[:12])
+        yield from cached_chunks
+        return
+    chunks = []
+    for chunk in get_gemini_response_stream(text, history, system_instruction, usage):
+        chunks.append(chunk)
+        yield chunk
+    if usage.get('finish_reason') == 'STOP' and chunks:
+        cache.put(key, chunks)
+
 def list_sessions(user_id):
     try:
-        app_logger.info(f"Listing sessions for user_id: {user_id}")
+        app_logger.info("Listing sessions for user_id: %s", user_id)
         return get_sessions_db(user_id)
     except Exception as e:
-        error_logger.error(f"list_sessions error: {e}", exc_info=True)
+        error_logger.error("list_sessions error: %s", e, exc_info=True)
         return []
 
+def list_sessions_page(user_id, limit, before=None):
+    """
+    Sessions by most recent activity, one keyset page at a time.
+    Raises ValueError for malformed cursors.
+    """
+    before_pos = decode_cursor(before) if before else None
+    try:
+        app_logger.info("Listing session page for user_id: %s", user_id)
+        sessions, has_more = get_sessions_page_db(user_id, limit, before=before_pos)
+        last = sessions[-1] if sessions else None
+        return {
+            'sessions': sessions,
+            'has_more': has_more,
+            'before': encode_cursor(last['last_activity_at'], last['id']) if last and has_more else None
+        }
+    except Exception as e:
+        error_logger.error("list_sessions_page error: %s", e, exc_info=True)
+        return {'sessions': [], 'has_more': False, 'before': None}
+
 def create_new_session(user_id, title):
     try:
-        app_logger.info(f"Creating new session for user_id: {user_id}, title: {title}")
+        app_logger.info("Creating new session for user_id: %s, title: %s", user_id, title)
         return create_session_db(user_id, title)
     except Exception as e:
-        error_logger.error(f"create_new_session error: {e}", exc_info=True)
+        error_logger.error("create_new_session error: %s", e, exc_info=True)
         return None
 
 def list_messages(session_id, user_id):
     try:
-        app_logger.info(f"Listing messages for session_id: {session_id}, user_id: {user_id}")
-        return get_messages_db(session_id)
+        app_logger.info("Listing messages for session_id: %s, user_id: %s", session_id, user_id)
+        return get_messages_db(session_id, user_id)
     except Exception as e:
-        error_logger.error(f"list_messages error: {e}", exc_info=True)
+        error_logger.error("list_messages error: %s", e, exc_info=True)
         return []
 
-def handle_user_message(session_id, user_id, text, is_first_message=False):
+def list_messages_page(session_id, user_id, limit, before=None, after=None):
+    """
+    Keyset-paginated history. before/after are opaque cursors from a previous page.
+    Raises ValueError for malformed cursors.
+    """
+    before_pos = decode_cursor(before) if before else None
+    after_pos = decode_cursor(after) if after else None
+    try:
+        app_logger.info("Listing message page for session_id: %s, user_id: %s", session_id, user_id)
+        messages, has_more = get_messages_page_db(session_id, user_id, limit, before=before_pos, after=after_pos)
+        return {
+            'messages': messages,
+            'has_more': has_more,
+            # Cursor to load older messages / to poll for newer ones
+            'before': encode_cursor(messages[0]['created_at'], messages[0]['id']) if messages else before,
+            'after': encode_cursor(messages[-1]['created_at'], messages[-1]['id']) if messages else after
+        }
+    except Exception as e:
+        error_logger.error("list_messages_page error: %s", e, exc_info=True)
+        return {'messages': [], 'has_more': False, 'before': before, 'after': after}
+
+def handle_user_message(session_id, user_id, text, is_first_message=False, on_chunk=None, ai_msg_id=None, use_cache=True, cancel_token=None):
+    """
+    Streams the Gemini reply with the session's recent turns and rolling summary as context,
+    then persists the user message and the assembled AI text together as one transaction.
+    on_chunk: optional callback invoked with each text chunk as soon as it arrives.
+    ai_msg_id: optional pre-allocated id for the AI message.
+    use_cache: False to always ask Gemini, bypassing the response cache.
+    cancel_token: optional CancelToken; once cancelled the Gemini stream is closed and, as with a
+    broken stream, the truncated reply is not persisted. The result then has 'cancelled': True.
+    """
     try:
-        app_logger.info(f"Handling user message for session_id: {session_id}, user_id: {user_id}")
-        msg_id = add_user_message_db(session_id, text)
-        ai_text_chunks = [chunk for chunk in get_gemini_response_stream(text)] # Streamed chunks
+        app_logger.info("Handling user message for session_id: %s, user_id: %s", session_id, user_id)
+        # session_id comes from the client: never read history from or write into someone else's session
+        if not is_session_owner_db(session_id, user_id):
+            app_logger.warning("Session %s not found for user_id: %s", session_id, user_id)
+            release_db()
+            return {'error': 'Session not found', 'code': 'NOT_FOUND'}
+        if is_first_message:
+            # Instant placeholder, stored as it is shown so the client and DB agree whatever happens
+            # to the reply; the LLM title replaces it in the background after a successful reply
+            placeholder_title = heuristic_title(text)
+            update_session_title_db(session_id, user_id, placeholder_title)
+            _emit_title_update(session_id, user_id, placeholder_title)
+            # Nothing to remember yet
+            context = empty_context(text)
+        else:
+            context = build_conversation_context(session_id, user_id, text)
+        # Don't hold a pooled connection while the reply streams
+        release_db()
+        usage = {}
+        ai_text_chunks = []
+        # Gone before the reply started (e.g. disconnected while context was built): skip the LLM call
+        cancelled = cancel_token is not None and cancel_token.cancelled
+        stream = _stream_reply(text, context, usage, use_cache=use_cache)
+        try:
+            for chunk in ([] if cancelled else stream):
+                if cancel_token is not None and cancel_token.cancelled:
+                    cancelled = True
+                    break
+                ai_text_chunks.append(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+        finally:
+            # Closing the generator closes the upstream response and frees the admission permit
+            stream.close()
         ai_text = ''.join(ai_text_chunks)
-        ai_msg_id = add_ai_message_db(session_id, ai_text)
+        if cancelled:
+            cancel_token.record_saved('llm_streams')
+            app_logger.info("Reply cancelled (%s) for session_id: %s after %s chunks", cancel_token.reason, session_id, len(ai_text_chunks))
+            # A partial answer is not a reply: keep it out of the history, summaries and later prompts
+            release_db()
+            return {'cancelled': True, 'ai_msg_id': ai_msg_id, 'ai_text': ai_text}
+        app_logger.info(
+            "Prompt for session_id: %s: %s history messages, summary of %s, ~%s tokens estimated, %s reported%s",
+            session_id, context['history_messages'], context['summarized_messages'], context['estimated_tokens'],
+            usage.get('prompt_tokens'), ' (served from cache)' if usage.get('cached') else ''
+        )
+        msg_id, ai_msg_id = add_turn_db(session_id, text, ai_text, ai_msg_id=ai_msg_id)
+        if msg_id is None:
+            # The turn was not committed (the pool rolls the connection back when it is returned):
+            # report it instead of ending a reply that was never saved
+            error_logger.error("Chat turn not saved for session_id: %s", session_id)
+            release_db()
+            return {'error': 'Failed to save the message', 'code': 'DB_ERROR'}
+        schedule_summary_refresh(current_app._get_current_object(), session_id, user_id, context)
 
-        # Auto-generate session title if flagged as first message
         if is_first_message:
-            prompt = f"Generate strictly only one concise chat title, 3-4 words only, plain text, no symbols for this conversation: {ai_text}"
-            new_title = get_gemini_response(prompt)
-            update_session_title_db(session_id, user_id, new_title)
-            try:
-                socketio = sys.modules.get('server_socketio')
-                if socketio:
-                    socketio.emit('session:title:update', {
-                        'session_id': session_id,
-                        'title': new_title
-                    }, room=str(user_id))
-            except Exception as e:
-                error_logger.error(f"Socket Emit Error: {e}", exc_info=True)
+            # If the queue is full the stored placeholder simply stays
+            title_pool.submit(
+                _generate_session_title, current_app._get_current_object(),
+                session_id, user_id, ai_text, placeholder_title
+            )
 
+        # Socket handlers keep streaming text and audio after this returns
+        release_db()
         return {
             'user_msg_id': msg_id,
             'ai_msg_id': ai_msg_id,
             'ai_text': ai_text,
-            'ai_text_chunks': ai_text_chunks
+            'ai_text_chunks': ai_text_chunks,
+            'prompt': {
+                'history_messages': context['history_messages'],
+                'summarized_messages': context['summarized_messages'],
+                'estimated_tokens': context['estimated_tokens'],
+                'prompt_tokens': usage.get('prompt_tokens'),
+                'output_tokens': usage.get('output_tokens'),
+                'cached': usage.get('cached', False)
+            }
         }
+    except UpstreamBusy as e:
+        # Shed before anything was streamed or stored
+        return {'error': str(e), 'code': 'BUSY'}
+    except GeminiStreamError as e:
+        # The truncated text was streamed but is neither saved nor ended as a reply
+        return {'error': str(e), 'code': 'AI_STREAM_ERROR'}
+    except GeminiAPIError as e:
+        # Failed before any text arrived: there is no reply to save, speak or send back as context
+        return {'error': str(e), 'code': 'AI_ERROR'}
     except Exception as e:
-        error_logger.error(f"handle_user_message error: {e}", exc_info=True)
+        error_logger.error("handle_user_message error: %s", e, exc_info=True)
         return {'error': str(e)}
 
 def delete_session(session_id, user_id):
     try:
-        app_logger.info(f"Deleting session {session_id} for user_id: {user_id}")
+        app_logger.info("Deleting session %s for user_id: %s", session_id, user_id)
         return delete_session_db(session_id, user_id)
     except Exception as e:
-        error_logger.error(f"delete_session error: {e}", exc_info=True)
+        error_logger.error("delete_session error: %s", e, exc_info=True)
         return False
 
 def update_session_title(session_id, user_id, new_title):
     try:
-        app_logger.info(f"Updating session title for session_id: {session_id}, user_id: {user_id}, new_title: {new_title}")
+        app_logger.info("Updating session title for session_id: %s, user_id: %s, new_title: %s", session_id, user_id, new_title)
         return update_session_title_db(session_id, user_id, new_title)
     except Exception as e:
-        error_logger.error(f"update_session_title error: {e}", exc_info=True)
+        error_logger.error("update_session_title error: %s", e, exc_info=True)
         return False
\ No newline at end of file
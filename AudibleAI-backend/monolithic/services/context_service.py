@@ -0,0 +1,175 @@
+import os
+import threading
+from datetime import datetime
+from components.postgres.chat_queries import (
+    get_messages_page_db,
+    get_session_summary_db,
+    save_session_summary_db
+)
+from components.llm_models.gemini_flash import get_gemini_response
+from monolithic.utils.worker_pool import BoundedWorkerPool
+import logging
+from logging_config import app_logger, error_logger
+
+GEMINI_ERROR_PREFIX = '[Gemini API Error]'
+# Position before any message, for summarising a session from its first message
+HISTORY_START = (datetime.min, '00000000-0000-0000-0000-000000000000')
+
+# Summaries call the LLM; keep them off the chat path and bounded like title jobs
+summary_pool = BoundedWorkerPool(
+    'context-summary',
+    max_workers=int(os.getenv('CONTEXT_SUMMARY_WORKERS', 1)),
+    max_queue=int(os.getenv('CONTEXT_SUMMARY_QUEUE_SIZE', 100))
+)
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (~4 characters per token for English text) used for budgeting.
+    Gemini's own count for each request is logged once the stream completes.
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _position(message):
+    return (message['created_at'], message['id'])
+
+
+def empty_context(user_text):
+    return {
+        'history': [],
+        'system_instruction': None,
+        'estimated_tokens': estimate_tokens(user_text),
+        'history_messages': 0,
+        'summarized_messages': 0,
+        'needs_summary': False,
+        'summary_before': None
+    }
+
+
+def build_conversation_context(session_id, user_id, user_text):
+    """
+    Assembles the prompt context for a new message under CONTEXT_TOKEN_BUDGET tokens:
+    the session's rolling summary (sent as the system instruction) plus as many of the
+    most recent unsummarised messages as fit. needs_summary is set when older messages
+    fell out of the window without being summarised yet; summary_before is the position
+    of the oldest message kept in the window.
+    """
+    context = empty_context(user_text)
+    budget = int(os.getenv('CONTEXT_TOKEN_BUDGET', 4000))
+    if budget <= 0:
+        return context
+    try:
+        summary_row = get_session_summary_db(session_id)
+        covered = summary_row['covered_until'] if summary_row else None
+        fetched, has_older = get_messages_page_db(session_id, user_id, int(os.getenv('CONTEXT_MAX_MESSAGES', 50)))
+        messages = [m for m in fetched if covered is None or _position(m) > covered]
+
+        used = context['estimated_tokens']
+        if summary_row:
+            context['system_instruction'] = f"Summary of the earlier conversation with this user:\n{summary_row['summary']}"
+            context['summarized_messages'] = summary_row['covered_messages']
+            used += estimate_tokens(context['system_instruction'])
+
+        window = []
+        for message in reversed(messages):
+            cost = estimate_tokens(message['text'])
+            if used + cost > budget:
+                break
+            used += cost
+            window.append(message)
+        window.reverse()
+
+        history = []
+        for message in window:
+            if message['sender'] == 'AI' and message['text'].startswith(GEMINI_ERROR_PREFIX):
+                continue
+            role = 'model' if message['sender'] == 'AI' else 'user'
+            if history and history[-1]['role'] == role:
+                history[-1]['text'] += '\n\n' + message['text']
+            elif history or role == 'user':
+                history.append({'role': role, 'text': message['text']})
+
+        context['history'] = history
+        context['estimated_tokens'] = used
+        context['history_messages'] = len(window)
+        # Unsummarised messages older than the window: dropped for budget, or beyond the fetched page
+        context['needs_summary'] = len(window) < len(messages) or (has_older and len(messages) == len(fetched))
+        context['summary_before'] = _position(window[0]) if window else None
+        return context
+    except Exception as e:
+        error_logger.error("build_conversation_context error: %s", e, exc_info=True)
+        return empty_context(user_text)
+
+
+def _summarize(summary, messages):
+    max_chars = int(os.getenv('CONTEXT_SUMMARY_MESSAGE_CHARS', 2000))
+    transcript = '\n'.join(
+        f"{'Assistant' if m['sender'] == 'AI' else 'User'}: {m['text'][:max_chars]}" for m in messages
+    )
+    prompt = (
+        "You maintain a running summary of a conversation between a user and an AI assistant. "
+        "Update the summary with the new messages. Keep facts, names, decisions, user preferences "
+        "and open questions; drop greetings and filler. Reply with the updated summary only, "
+        f"plain text, at most {int(os.getenv('CONTEXT_SUMMARY_WORDS', 250))} words.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+    )
+    result = get_gemini_response(prompt).strip()
+    if not result or result.startswith(GEMINI_ERROR_PREFIX):
+        return None
+    return result
+
+
+def _refresh_session_summary(app, session_id, user_id, before):
+    """
+    Background job: fold every unsummarised message older than `before` into the rolling
+    summary, a batch at a time. before=None folds everything stored.
+    """
+    try:
+        with app.app_context():
+            row = get_session_summary_db(session_id)
+            summary = row['summary'] if row else None
+            covered = row['covered_until'] if row else None
+            covered_messages = row['covered_messages'] if row else 0
+            batch_size = int(os.getenv('CONTEXT_SUMMARY_BATCH', 40))
+            for _batch in range(int(os.getenv('CONTEXT_SUMMARY_MAX_BATCHES', 5))):
+                page, _ = get_messages_page_db(session_id, user_id, batch_size, after=covered or HISTORY_START)
+                page = [m for m in page if before is None or _position(m) < before]
+                if not page:
+                    break
+                new_summary = _summarize(summary, page)
+                if new_summary is None:
+                    break
+                new_covered = _position(page[-1])
+                if not save_session_summary_db(session_id, new_summary, new_covered,
+                                               covered_messages + len(page), previous_until=covered):
+                    break
+                summary, covered, covered_messages = new_summary, new_covered, covered_messages + len(page)
+            app_logger.info("Session summary for session_id: %s covers %s messages", session_id, covered_messages)
+    finally:
+        with _summarizing_lock:
+            _summarizing.discard(session_id)
+
+
+def schedule_summary_refresh(app, session_id, user_id, context):
+    """
+    Queues a summary update when the context window dropped unsummarised messages.
+    At most one update per session is queued or running at a time.
+    """
+    try:
+        if not context.get('needs_summary'):
+            return False
+        with _summarizing_lock:
+            if session_id in _summarizing:
+                return False
+            _summarizing.add(session_id)
+        if summary_pool.submit(_refresh_session_summary, app, session_id, user_id, context['summary_before']):
+            return True
+        with _summarizing_lock:
+            _summarizing.discard(session_id)
+        return False
+    except Exception as e:
+        error_logger.error("schedule_summary_refresh error: %s", e, exc_info=True)
+        return False
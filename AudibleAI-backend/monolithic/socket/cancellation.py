@@ -0,0 +1,126 @@
+import threading
+from contextlib import contextmanager
+import logging
+from logging_config import app_logger, error_logger
+from metrics import counter
+
+jobs_cancelled_total = counter('audibleai_jobs_cancelled_total', 'Chat/TTS jobs cancelled before completion', ['kind', 'reason'])
+# Work not done thanks to cancellation: llm_streams cut short, tts_calls skipped, audio_bytes and text_frames not emitted
+cancel_saved_total = counter('audibleai_cancel_saved_total', 'Work skipped because its job was cancelled', ['resource'])
+
+
+class CancelToken:
+    """
+    Shared flag for one running job. Emit loops and upstream calls check `cancelled`
+    between steps and stop early; nothing is interrupted mid-call.
+    """
+
+    def __init__(self, user_id, message_id, kind, sid=None):
+        self.user_id = str(user_id)
+        self.message_id = message_id
+        self.kind = kind
+        self.sid = sid
+        self.reason = None
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason):
+        """
+        Returns True if this call cancelled the job, False if it already was.
+        """
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self._event.set()
+        jobs_cancelled_total.inc(kind=self.kind, reason=reason)
+        return True
+
+    def record_saved(self, resource, amount=1):
+        cancel_saved_total.inc(amount, resource=resource)
+
+
+class JobRegistry:
+    """
+    Running chat replies ('chat') and audio streams ('tts') per user, so they can be
+    cancelled on tts:stop, when a newer tts:start supersedes them, or when the socket
+    that asked for them disconnects.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # user_id -> set of CancelToken
+        self._counters = {'started': 0, 'completed': 0, 'cancelled': 0}
+
+    def start(self, user_id, message_id, kind, sid=None, supersede=False):
+        """
+        Registers a job and returns its token. supersede=True first cancels the user's
+        other jobs of the same kind (a new tts:start replaces whatever was playing).
+        """
+        token = CancelToken(user_id, message_id, kind, sid)
+        if supersede:
+            self.cancel(user_id, kind=kind, reason='superseded')
+        with self._lock:
+            self._jobs.setdefault(token.user_id, set()).add(token)
+            self._counters['started'] += 1
+        return token
+
+    def finish(self, token):
+        with self._lock:
+            jobs = self._jobs.get(token.user_id)
+            if jobs is not None:
+                jobs.discard(token)
+                if not jobs:
+                    del self._jobs[token.user_id]
+            self._counters['cancelled' if token.cancelled else 'completed'] += 1
+
+    @contextmanager
+    def track(self, user_id, message_id, kind, sid=None, supersede=False):
+        token = self.start(user_id, message_id, kind, sid, supersede)
+        try:
+            yield token
+        finally:
+            self.finish(token)
+
+    def _cancel_matching(self, match, reason):
+        with self._lock:
+            tokens = [token for jobs in self._jobs.values() for token in jobs if match(token)]
+        cancelled = sum(1 for token in tokens if token.cancel(reason))
+        if cancelled:
+            app_logger.info("Cancelled %s job(s): %s", cancelled, reason)
+        return cancelled
+
+    def cancel(self, user_id, message_id=None, kind=None, reason='stopped'):
+        """
+        Cancels the user's jobs, optionally only those for one message and/or of one kind.
+        """
+        user_id = str(user_id)
+        try:
+            return self._cancel_matching(
+                lambda t: t.user_id == user_id
+                and (message_id is None or t.message_id == message_id)
+                and (kind is None or t.kind == kind),
+                reason
+            )
+        except Exception as e:
+            error_logger.error("JobRegistry.cancel error: %s", e, exc_info=True)
+            return 0
+
+    def cancel_connection(self, sid, reason='disconnect'):
+        """
+        Cancels every job started from one socket connection.
+        """
+        try:
+            return self._cancel_matching(lambda t: t.sid == sid, reason)
+        except Exception as e:
+            error_logger.error("JobRegistry.cancel_connection error: %s", e, exc_info=True)
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'active': sum(len(jobs) for jobs in self._jobs.values())}
+
+
+job_registry = JobRegistry()
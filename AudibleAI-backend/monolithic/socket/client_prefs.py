@@ -0,0 +1,95 @@
+import os
+import json
+import threading
+import logging
+from logging_config import app_logger, error_logger
+from monolithic.socket.emitter import get_message_queue_url, get_message_queue_channel
+
+# Capabilities announced by clients on user:join, per connection (sid) under the user's id.
+# Emits target the whole user room, which spans every worker once a message queue is configured,
+# so callers must pick something every connection can take, wherever it is connected.
+# With a Redis message queue the announcements are shared through the same Redis; other queues
+# have no shared store, so each user then counts as one connection that announced nothing.
+_prefs = {}  # user_id -> {sid: prefs}, single-process mode
+_sid_users = {}  # sid -> user_id, for this process's connections
+_lock = threading.Lock()
+_redis = None
+
+def _get_redis():
+    """
+    Redis client on the message queue URL, or None when the queue is not Redis.
+    """
+    global _redis
+    url = get_message_queue_url()
+    if not url.startswith(('redis://', 'rediss://')):
+        return None
+    with _lock:
+        if _redis is None:
+            import redis
+            _redis = redis.Redis.from_url(url)
+            app_logger.info("Client audio preferences shared through Redis")
+        return _redis
+
+def _redis_key(user_id):
+    return f"{get_message_queue_channel()}:client_prefs:{user_id}"
+
+def set_client_prefs(user_id, sid, **prefs):
+    """
+    Records capabilities announced by one connection; None values are ignored.
+    Calling it without prefs registers a connection that has not announced anything yet.
+    """
+    try:
+        updates = {k: v for k, v in prefs.items() if v is not None}
+        with _lock:
+            _sid_users[sid] = str(user_id)
+        if get_message_queue_url():
+            client = _get_redis()
+            if client is not None:
+                key = _redis_key(user_id)
+                current = json.loads(client.hget(key, sid) or '{}')
+                current.update(updates)
+                # Entries of a worker that died without disconnecting its sockets expire eventually
+                client.pipeline().hset(key, sid, json.dumps(current)).expire(
+                    key, int(os.getenv('CLIENT_PREFS_TTL', 86400))
+                ).execute()
+            return
+        with _lock:
+            _prefs.setdefault(str(user_id), {}).setdefault(sid, {}).update(updates)
+    except Exception as e:
+        error_logger.error("set_client_prefs error: %s", e, exc_info=True)
+
+def remove_client_prefs(sid):
+    """
+    Forgets a disconnected connection.
+    """
+    try:
+        with _lock:
+            user_id = _sid_users.pop(sid, None)
+            connections = _prefs.get(user_id)
+            if connections is not None:
+                connections.pop(sid, None)
+                if not connections:
+                    del _prefs[user_id]
+        if user_id is not None and get_message_queue_url():
+            client = _get_redis()
+            if client is not None:
+                client.hdel(_redis_key(user_id), sid)
+    except Exception as e:
+        error_logger.error("remove_client_prefs error: %s", e, exc_info=True)
+
+def get_client_prefs(user_id):
+    """
+    Returns the announcements of each of the user's connections (an empty list if none).
+    """
+    if get_message_queue_url():
+        try:
+            client = _get_redis()
+            if client is None:
+                # Connections on other workers are unknown: negotiate for one that announced nothing
+                return [{}]
+            return [json.loads(prefs) for prefs in client.hgetall(_redis_key(user_id)).values()]
+        except Exception as e:
+            error_logger.error("get_client_prefs error: %s", e, exc_info=True)
+            return [{}]
+    with _lock:
+        return [dict(prefs) for prefs in _prefs.get(str(user_id), {}).values()]
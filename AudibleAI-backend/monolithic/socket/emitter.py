@@ -0,0 +1,60 @@
+import os
+import threading
+import logging
+from flask_socketio import SocketIO
+from logging_config import app_logger, error_logger
+
+# The server's SocketIO instance, registered by server.py at startup
+_socketio = None
+_lock = threading.Lock()
+
+
+def get_message_queue_url():
+    """
+    Redis (or other Flask-SocketIO message queue) URL shared by all workers; None runs single-process.
+    """
+    return os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+
+
+def get_message_queue_channel():
+    return os.getenv('SOCKETIO_CHANNEL', 'audibleai')
+
+
+def init_emitter(socketio):
+    """
+    Registers the server's SocketIO instance as the emitter for services and background jobs.
+    """
+    global _socketio
+    with _lock:
+        _socketio = socketio
+
+
+def get_emitter():
+    """
+    Returns the registered server instance. A process without one (a script or job runner)
+    gets a write-only emitter on the message queue, which reaches clients on every worker.
+    Returns None when neither is available.
+    """
+    global _socketio
+    with _lock:
+        if _socketio is None and get_message_queue_url():
+            _socketio = SocketIO(message_queue=get_message_queue_url(), channel=get_message_queue_channel())
+            app_logger.info("Write-only Socket.IO emitter created on the message queue")
+        return _socketio
+
+
+def emit_to_user(event, data, user_id):
+    """
+    Emits an event to every connection of a user, whichever worker holds them.
+    Returns False when no emitter is available or the emit failed.
+    """
+    try:
+        socketio = get_emitter()
+        if socketio is None:
+            app_logger.warning("No Socket.IO emitter available, dropping %s for user_id: %s", event, user_id)
+            return False
+        socketio.emit(event, data, room=str(user_id))
+        return True
+    except Exception as e:
+        error_logger.error("emit_to_user error: %s", e, exc_info=True)
+        return False
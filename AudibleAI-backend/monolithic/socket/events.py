@@ -1,59 +1,170 @@
-import os
-import base64
+import time
+import uuid
 import logging
+from flask import session, request
 from flask_socketio import join_room
 from monolithic.services.chat_service import handle_user_message
 from monolithic.socket.utils import (
-    emit_stream_chunks, emit_response_end, 
-    get_user_room, stream_tts_audio
+    emit_response_end, emit_response_error, emit_audio_chunks,
+    get_user_room, stream_tts_audio, get_socket_user_id, is_socket_auth_required, get_audio_format
 )
+from monolithic.utils.jwt_utils import verify_jwt_token
+from monolithic.socket.client_prefs import set_client_prefs, remove_client_prefs
+from monolithic.socket.pacing import StreamPacer
+from monolithic.socket.tts_pipeline import SentenceTTSPipeline, is_tts_pipeline_enabled
+from monolithic.socket.cancellation import job_registry
 from monolithic.utils.text_processing import clean_markdown_for_tts
-from logging_config import app_logger, error_logger
-from components.tts.google_chirp import generate_tts_audio
+from logging_config import app_logger, error_logger, set_log_context
+from components.tts.audio_cache import get_tts_audio_bytes
+from components.tts.google_chirp import get_audio_mime_type, get_audio_encoding
+from components.http_client.admission import UpstreamBusy
+from monolithic.services.audio_service import store_message_audio, load_user_message_audio
+from metrics import time_to_first_text_seconds, time_to_first_audio_seconds
 
 def register_socket_events(socketio):
+    @socketio.on('connect')
+    def on_connect(auth=None):
+        try:
+            token = (auth or {}).get('token')
+            user_id = verify_jwt_token(token) if token else None
+            if user_id:
+                # Verified once per connection; handlers read it back via get_socket_user_id()
+                session['user_id'] = user_id
+                join_room(get_user_room(user_id))
+                # Counts as MP3/base64-only until it announces more on user:join
+                set_client_prefs(user_id, request.sid)
+                app_logger.info("Socket connected for user_id: %s", user_id)
+                return True
+            if is_socket_auth_required():
+                app_logger.warning("Socket connection rejected: missing or invalid token")
+                return False
+            return True
+        except Exception as e:
+            error_logger.error("Socket connect error: %s", e, exc_info=True)
+            return False
+
+    @socketio.on('disconnect')
+    def on_disconnect(reason=None):
+        try:
+            # Nobody is listening any more: stop replies and audio this socket asked for
+            cancelled = job_registry.cancel_connection(request.sid, reason='disconnect')
+            remove_client_prefs(request.sid)
+            app_logger.info("Socket disconnected (%s), %s job(s) cancelled", reason, cancelled)
+        except Exception as e:
+            error_logger.error("Socket disconnect error: %s", e, exc_info=True)
+
     @socketio.on('user:join')
     def on_join(data):
         try:
-            user_id = data.get('user_id')
-            app_logger.info(f"Socket user:join for user_id: {user_id}")
+            user_id = get_socket_user_id(data.get('user_id'))
+            app_logger.info("Socket user:join for user_id: %s", user_id)
             if user_id:
                 join_room(get_user_room(user_id))
+                # Clients announce binary attachments and the audio encodings they can decode
+                # (e.g. ["OGG_OPUS", "MP3"]), optionally with a lower sampleRate for mobile
+                set_client_prefs(
+                    user_id,
+                    request.sid,
+                    audioTransport=data.get('audioTransport'),
+                    audioFormats=data.get('audioFormats'),
+                    sampleRate=data.get('sampleRate')
+                )
         except Exception as e:
-            error_logger.error(f"Socket user:join error: {e}", exc_info=True)
+            error_logger.error("Socket user:join error: %s", e, exc_info=True)
 
     @socketio.on('user:message')
     def on_user_message(data):
+        received_at = time.monotonic()
         try:
             session_id = data.get('session_id')
-            user_id = data.get('user_id')
+            user_id = get_socket_user_id(data.get('user_id'))
             text = data.get('text')
             is_first_message = data.get('is_first_message', False)
-            app_logger.info(f"Socket user:message for session_id: {session_id}, user_id: {user_id}")
+            # Clients can insist on a fresh answer, e.g. for "regenerate"
+            use_cache = not data.get('noCache', False)
+            set_log_context(user_id=user_id, session_id=session_id)
+            app_logger.info("Socket user:message for session_id: %s, user_id: %s", session_id, user_id)
             if session_id and user_id and text:
-                result = handle_user_message(session_id, user_id, text, is_first_message=is_first_message)
-                
-                # Stream text response chunks
-                emit_stream_chunks(socketio, user_id, session_id, result.get('ai_text_chunks', []), delay=float(os.getenv('STREAM_DELAY', 0.5)))
-                app_logger.info(f"Delay used: {os.getenv('STREAM_DELAY', 0.5)}")
-                
-                # Send complete response and trigger auto TTS
-                ai_msg_id = result.get('ai_msg_id')
-                ai_text = result.get('ai_text')
-                emit_response_end(socketio, user_id, session_id, ai_msg_id, ai_text)
-                
+                ai_msg_id = str(uuid.uuid4())
+                sid = request.sid
+                # Registered so a disconnect of this socket stops the reply mid-stream
+                with job_registry.track(user_id, ai_msg_id, 'chat', sid=sid) as chat_token:
+                    # Text frames are paced in the background; the LLM loop and TTS never wait on them
+                    pacer = StreamPacer(socketio, user_id, session_id, cancel_token=chat_token)
+
+                    if is_tts_pipeline_enabled():
+                        # Synthesize sentence by sentence while the reply is still streaming;
+                        # the new reply's audio replaces whatever the user was listening to
+                        with job_registry.track(user_id, ai_msg_id, 'tts', sid=sid, supersede=True) as tts_token:
+                            pipeline = SentenceTTSPipeline(socketio, user_id, ai_msg_id, auto_play=True, cancel_token=tts_token)
+
+                            def on_chunk(chunk):
+                                pacer.push(chunk)
+                                pipeline.feed(chunk)
+
+                            result = handle_user_message(
+                                session_id, user_id, text, is_first_message=is_first_message,
+                                on_chunk=on_chunk, ai_msg_id=ai_msg_id, use_cache=use_cache, cancel_token=chat_token
+                            )
+                            pacer.close()
+                            if pacer.first_frame_at is not None:
+                                time_to_first_text_seconds.observe(pacer.first_frame_at - received_at)
+                            if 'error' in result or result.get('cancelled'):
+                                pipeline.abort()
+                                if 'error' in result:
+                                    emit_response_error(socketio, user_id, session_id, result.get('code', 'AI_ERROR'), result['error'])
+                                return
+                            emit_response_end(socketio, user_id, session_id, result.get('ai_msg_id'), result.get('ai_text'))
+                            pipeline.finish()
+                            if pipeline.first_audio_at is not None:
+                                time_to_first_audio_seconds.observe(pipeline.first_audio_at - received_at)
+                            if pipeline.complete:
+                                store_message_audio(ai_msg_id, pipeline.audio_bytes, pipeline.mime_type)
+                        return
+
+                    result = handle_user_message(
+                        session_id, user_id, text, is_first_message=is_first_message,
+                        on_chunk=pacer.push, ai_msg_id=ai_msg_id, use_cache=use_cache, cancel_token=chat_token
+                    )
+                    pacer.close()
+                    if pacer.first_frame_at is not None:
+                        time_to_first_text_seconds.observe(pacer.first_frame_at - received_at)
+                    if 'error' in result:
+                        emit_response_error(socketio, user_id, session_id, result.get('code', 'AI_ERROR'), result['error'])
+                        return
+                    if result.get('cancelled'):
+                        return
+
+                    # Send complete response and trigger auto TTS
+                    ai_msg_id = result.get('ai_msg_id')
+                    ai_text = result.get('ai_text')
+                    emit_response_end(socketio, user_id, session_id, ai_msg_id, ai_text)
+
                 # Generate and stream TTS audio with auto-play flag
-                stream_tts_audio(socketio, user_id, ai_msg_id, ai_text, auto_play=True)
+                with job_registry.track(user_id, ai_msg_id, 'tts', sid=sid, supersede=True) as tts_token:
+                    stream_tts_audio(socketio, user_id, ai_msg_id, ai_text, auto_play=True, received_at=received_at, cancel_token=tts_token)
         except Exception as e:
-            error_logger.error(f"Socket user:message error: {e}", exc_info=True)
+            error_logger.error("Socket user:message error: %s", e, exc_info=True)
 
     @socketio.on('tts:start')
     def on_tts_start(data):
+        data = data if isinstance(data, dict) else {}
+        # Resolved before anything can fail: errors go to the authenticated user's room,
+        # never to a room named by the payload's userId
+        user_id = get_socket_user_id(data.get('userId'))
+
+        def emit_tts_error(code, message):
+            if user_id:
+                socketio.emit('tts:error', {
+                    'messageId': data.get('messageId'),
+                    'code': code,
+                    'message': message
+                }, room=get_user_room(user_id))
+
         try:
             # Extract all required data first
             message_id = data.get('messageId')
             text = data.get('text')
-            user_id = data.get('userId')
             
             # Validate required fields
             if not all([message_id, text, user_id]):
@@ -63,73 +174,71 @@ def register_socket_events(socketio):
             voice = data.get('voice')
             speaking_rate = data.get('speakingRate')
             pitch = data.get('pitch')
+            # Per-request format override, e.g. a download in MP3 on an Opus connection
+            encoding, sample_rate = get_audio_format(user_id, data.get('audioFormat'), data.get('sampleRate'))
+            mime_type = get_audio_mime_type(encoding)
 
-            app_logger.info(f"Socket tts:start for message_id: {message_id}, user_id: {user_id}")
+            app_logger.info("Socket tts:start for message_id: %s, user_id: %s", message_id, user_id)
 
-            # Clean markdown and prepare text for TTS
-            clean_text = clean_markdown_for_tts(text)
-            app_logger.debug(f"Original text: {text[:30]}...")
-            app_logger.debug(f"Cleaned text for TTS: {clean_text[:30]}...")
-            
-            # Generate audio from cleaned text
-            audio_b64 = generate_tts_audio(clean_text, voice, speaking_rate, pitch)
-            audio_bytes = base64.b64decode(audio_b64)
+            # A new tts:start replaces the user's current playback, which stops streaming
+            with job_registry.track(user_id, message_id, 'tts', sid=request.sid, supersede=True) as tts_token:
+                # Clean markdown and prepare text for TTS
+                clean_text = clean_markdown_for_tts(text)
+                app_logger.debug("Original text: %s...", text[:30])
+                app_logger.debug("Cleaned text for TTS: %s...", clean_text[:30])
 
-            # Stream audio in chunks
-            chunk_size = 8192  # Increased chunk size for better performance
-            total_chunks = (len(audio_bytes) + chunk_size - 1) // chunk_size
+                # A plain replay plays the audio auto TTS stored for the user's message when it is
+                # already in the negotiated encoding; the sentence pipeline stores MP3, so Opus clients
+                # get the reply synthesized once in Opus, which the TTS cache keeps for later replays
+                audio_bytes = None
+                if not any([voice, speaking_rate, pitch, data.get('sampleRate')]):
+                    stored = load_user_message_audio(message_id, user_id)
+                    if stored and get_audio_encoding(stored[1]) == encoding:
+                        audio_bytes = stored[0]
+                        app_logger.debug("Socket tts:start replaying stored audio for message_id: %s", message_id)
 
-            # Send audio chunks
-            user_room = get_user_room(user_id)
-            for i in range(total_chunks):
-                chunk = audio_bytes[i*chunk_size:(i+1)*chunk_size]
-                chunk_b64 = base64.b64encode(chunk).decode('utf-8')
-                is_last = i == total_chunks - 1
+                # messageId and text come from the client, so replays are never persisted;
+                # stored message audio is written only by the server-side auto TTS path
+                if audio_bytes is None:
+                    audio_bytes = get_tts_audio_bytes(clean_text, voice, speaking_rate, pitch, encoding, sample_rate)
 
-                # Emit chunk
-                socketio.emit('tts:audio', {
+                # Stream audio in chunks
+                emit_audio_chunks(socketio, user_id, message_id, audio_bytes, cancel_token=tts_token, audio_encoding=encoding)
+                if tts_token.cancelled:
+                    app_logger.info("Socket tts:start for message_id: %s cancelled (%s)", message_id, tts_token.reason)
+                    return
+                socketio.emit('tts:ready', {
                     'messageId': message_id,
-                    'chunkSeq': i,
-                    'bytes': chunk_b64,
-                    'isLast': is_last
-                }, room=user_room)
-
-                # If this is the last chunk, let client know processing is complete
-                if is_last:
-                    socketio.emit('tts:ready', {
-                        'messageId': message_id,
-                        'duration': None  # Could add audio duration if needed
-                    }, room=user_room)
+                    'duration': None,  # Could add audio duration if needed
+                    'mimeType': mime_type
+                }, room=get_user_room(user_id))
 
+        except UpstreamBusy as e:
+            emit_tts_error('TTS_BUSY', str(e))
         except ValueError as e:
             # Handle validation errors
-            error_logger.warning(f"Socket tts:start validation error: {e}")
-            socketio.emit('tts:error', {
-                'messageId': data.get('messageId'),
-                'code': 'VALIDATION_ERROR',
-                'message': str(e)
-            }, room=get_user_room(data.get('userId')))
+            error_logger.warning("Socket tts:start validation error: %s", e)
+            emit_tts_error('VALIDATION_ERROR', str(e))
         except Exception as e:
             # Handle other errors
-            error_logger.error(f"Socket tts:start error: {e}", exc_info=True)
-            socketio.emit('tts:error', {
-                'messageId': data.get('messageId'),
-                'code': 'TTS_ERROR',
-                'message': 'Failed to generate audio'
-            }, room=get_user_room(data.get('userId')))
+            error_logger.error("Socket tts:start error: %s", e, exc_info=True)
+            emit_tts_error('TTS_ERROR', 'Failed to generate audio')
 
     @socketio.on('tts:stop')
     def on_tts_stop(data):
         try:
             # Extract and validate required fields
             message_id = data.get('messageId')
-            user_id = data.get('userId')
+            user_id = get_socket_user_id(data.get('userId'))
             
             if not all([message_id, user_id]):
                 raise ValueError("Missing required fields: messageId or userId")
                 
-            app_logger.info(f"Socket tts:stop for message_id: {message_id}, user_id: {user_id}")
+            app_logger.info("Socket tts:stop for message_id: %s, user_id: %s", message_id, user_id)
             
+            # Stop synthesis and chunk emission still running for this message
+            job_registry.cancel(user_id, message_id=message_id, kind='tts', reason='stopped')
+
             # Get user room once
             user_room = get_user_room(user_id)
             
@@ -140,6 +249,6 @@ def register_socket_events(socketio):
             }, room=user_room)
             
         except ValueError as e:
-            error_logger.warning(f"Socket tts:stop validation error: {e}")
+            error_logger.warning("Socket tts:stop validation error: %s", e)
         except Exception as e:
-            error_logger.error(f"Socket tts:stop error: {e}", exc_info=True)
+            error_logger.error("Socket tts:stop error: %s", e, exc_info=True)
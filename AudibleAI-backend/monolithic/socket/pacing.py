@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+import logging
+from logging_config import app_logger, error_logger
+from monolithic.socket.utils import emit_stream_chunk
+
+
+class StreamPacer:
+    """
+    Paces AI text chunks to the client without holding up the producer.
+
+    push() only appends to a buffer; a background task emits `ai:response:chunk` frames.
+    Without a typing rate, tiny chunks are coalesced and flushed every `flush_ms`
+    milliseconds or once `flush_bytes` have accumulated, whichever comes first.
+    With `cps` (characters per second) set, text is released at that rate for a
+    typing effect instead, never faster than it arrives.
+    Once `cancel_token` is cancelled, buffered and later text is dropped instead of emitted.
+    """
+
+    def __init__(self, socketio, user_id, session_id, flush_ms=None, flush_bytes=None, cps=None, cancel_token=None):
+        self.socketio = socketio
+        self.user_id = user_id
+        self.session_id = session_id
+        self.flush_interval = (flush_ms if flush_ms is not None else float(os.getenv('STREAM_FLUSH_MS', 50))) / 1000.0
+        self.flush_bytes = flush_bytes if flush_bytes is not None else int(os.getenv('STREAM_FLUSH_BYTES', 256))
+        self.cps = cps if cps is not None else float(os.getenv('STREAM_CPS', 0))
+        self.cancel_token = cancel_token
+
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._first_buffered_at = None
+        self._closed = False
+        self._finished = threading.Event()
+        self.frames = 0
+        self.chunks = 0
+        self.first_frame_at = None
+        self.socketio.start_background_task(self._run)
+
+    def push(self, chunk):
+        if not chunk:
+            return
+        with self._cond:
+            self._buffer.append(chunk)
+            self._buffered_bytes += len(chunk.encode('utf-8'))
+            if self._first_buffered_at is None:
+                self._first_buffered_at = time.monotonic()
+            self.chunks += 1
+            self._cond.notify()
+
+    def close(self, timeout=None):
+        """
+        Flush everything still buffered and wait until it has been emitted.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._finished.wait(timeout)
+        app_logger.info("Stream pacer: %s chunks sent as %s frames to user_id: %s, session_id: %s", self.chunks, self.frames, self.user_id, self.session_id)
+
+    def _take(self, max_chars=None):
+        """
+        Must be called with the condition held.
+        """
+        text = ''.join(self._buffer)
+        rest = ''
+        if max_chars is not None and len(text) > max_chars:
+            text, rest = text[:max_chars], text[max_chars:]
+        self._buffer = [rest] if rest else []
+        self._buffered_bytes = len(rest.encode('utf-8')) if rest else 0
+        self._first_buffered_at = time.monotonic() if rest else None
+        return text
+
+    def _emit(self, text):
+        if text and self.cancel_token is not None and self.cancel_token.cancelled:
+            self.cancel_token.record_saved('text_frames')
+            return
+        if text:
+            emit_stream_chunk(self.socketio, self.user_id, self.session_id, text)
+            if self.first_frame_at is None:
+                self.first_frame_at = time.monotonic()
+            self.frames += 1
+
+    def _run(self):
+        try:
+            if self.cps > 0:
+                self._run_typing()
+            else:
+                self._run_coalescing()
+        except Exception as e:
+            error_logger.error("Stream pacer error: %s", e, exc_info=True)
+        finally:
+            self._finished.set()
+
+    def _run_coalescing(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    return
+                # Hold the frame open until it is big enough, old enough, or the stream ended
+                while not self._closed and self._buffered_bytes < self.flush_bytes:
+                    remaining = self.flush_interval - (time.monotonic() - self._first_buffered_at)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                text = self._take()
+            self._emit(text)
+
+    def _run_typing(self):
+        frame_chars = max(1, int(round(self.cps * self.flush_interval)))
+        frame_interval = frame_chars / self.cps
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    return
+                text = self._take(frame_chars)
+            self._emit(text)
+            self.socketio.sleep(frame_interval)
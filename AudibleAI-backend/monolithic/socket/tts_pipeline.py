@@ -0,0 +1,170 @@
+import os
+import time
+import threading
+import logging
+from logging_config import app_logger, error_logger
+from monolithic.utils.text_processing import clean_markdown_for_tts, SentenceSegmenter
+from components.tts.audio_cache import get_tts_audio_bytes
+from components.tts.google_chirp import AUDIO_ENCODING, CONCATENABLE_ENCODINGS, get_audio_mime_type
+from monolithic.socket.utils import emit_audio_chunks, get_audio_format
+
+
+def is_tts_pipeline_enabled():
+    return os.getenv('TTS_PIPELINE', 'true').lower() in ('1', 'true', 'yes')
+
+
+class SentenceTTSPipeline:
+    """
+    Synthesizes AI text sentence by sentence while it is still streaming in.
+
+    Sentences are synthesized concurrently (at most `window` upstream calls at once)
+    and emitted strictly in order as `tts:audio` chunks tagged with `sentenceIdx`,
+    followed by `tts:segment:ready` per sentence. The final empty `isLast` chunk and
+    `tts:ready` are sent from finish(), so clients that just concatenate chunks keep working.
+    Cancelling `cancel_token` aborts the pipeline: queued sentences are not synthesized.
+    Sentence audio is joined into one file by clients and for storage, so an encoding that does
+    not concatenate (Ogg Opus) is replaced by MP3 here; the negotiated sample rate still applies.
+    """
+
+    def __init__(self, socketio, user_id, message_id, auto_play=False, window=None, cancel_token=None,
+                 encoding=None, sample_rate=None):
+        self.socketio = socketio
+        self.user_id = user_id
+        self.room = str(user_id)
+        self.message_id = message_id
+        self.auto_play = auto_play
+        self.cancel_token = cancel_token
+        self.encoding, self.sample_rate = get_audio_format(user_id, encoding, sample_rate)
+        if self.encoding not in CONCATENABLE_ENCODINGS:
+            self.encoding = AUDIO_ENCODING
+        self.mime_type = get_audio_mime_type(self.encoding)
+        window = window or int(os.getenv('TTS_PIPELINE_WINDOW', 3))
+
+        self._segmenter = SentenceSegmenter()
+        self._slots = threading.Semaphore(window)
+        self._emit_lock = threading.Lock()
+        self._done = threading.Condition()
+        self._results = {}  # sentence index -> audio bytes (None on failure)
+        self._next_idx = 0  # next sentence to be submitted
+        self._next_emit_idx = 0  # next sentence to be emitted
+        self._pending = 0
+        self._chunk_seq = 0
+        self._aborted = False
+        self._audio_parts = []
+        self._failed = False
+        self.complete = False
+        self.first_audio_at = None
+
+    def feed(self, text_chunk):
+        """
+        Add streamed text; every sentence it completes is queued for synthesis right away.
+        """
+        for sentence in self._segmenter.feed(text_chunk):
+            self._submit(sentence)
+
+    def finish(self, timeout=None):
+        """
+        Queue the unterminated tail, wait for outstanding sentences and close the audio stream.
+        """
+        for sentence in self._segmenter.flush():
+            self._submit(sentence)
+        if not self._stopped:
+            with self._done:
+                self._done.wait_for(lambda: self._pending == 0 or self._stopped, timeout)
+        if self._stopped:
+            return
+        with self._emit_lock:
+            self._emit_ready()
+            self.complete = self._next_emit_idx == self._next_idx and not self._failed
+            # Anything still outstanding after a timeout must not trail the final chunk
+            self._aborted = True
+            self._chunk_seq = emit_audio_chunks(
+                self.socketio, self.user_id, self.message_id, b'',
+                start_seq=self._chunk_seq, audio_encoding=self.encoding, autoPlay=self.auto_play
+            )
+            self.socketio.emit('tts:ready', {
+                'messageId': self.message_id,
+                'sentences': self._next_emit_idx,
+                'autoPlay': self.auto_play,
+                'mimeType': self.mime_type
+            }, room=self.room)
+        app_logger.info("TTS pipeline: completed %s sentences for message %s", self._next_emit_idx, self.message_id)
+
+    @property
+    def audio_bytes(self):
+        """
+        All emitted sentence audio concatenated in order (MP3 frames concatenate cleanly).
+        """
+        return b''.join(self._audio_parts)
+
+    def abort(self):
+        """
+        Stop emitting; sentences already being synthesized finish silently.
+        """
+        self._aborted = True
+
+    @property
+    def _stopped(self):
+        return self._aborted or (self.cancel_token is not None and self.cancel_token.cancelled)
+
+    def _submit(self, sentence):
+        idx = self._next_idx
+        self._next_idx += 1
+        with self._done:
+            self._pending += 1
+        self.socketio.start_background_task(self._synthesize, idx, sentence)
+
+    def _synthesize(self, idx, sentence):
+        audio_bytes = None
+        try:
+            with self._slots:
+                if self._stopped:
+                    if self.cancel_token is not None and self.cancel_token.cancelled:
+                        self.cancel_token.record_saved('tts_calls')
+                    return
+                clean_text = clean_markdown_for_tts(sentence)
+                # Sentences that are pure markup still occupy an index so highlighting stays aligned
+                audio_bytes = get_tts_audio_bytes(
+                    clean_text, encoding=self.encoding, sample_rate=self.sample_rate
+                ) if clean_text else b''
+        except Exception as e:
+            error_logger.error("TTS pipeline sentence %s error for message %s: %s", idx, self.message_id, e, exc_info=True)
+        finally:
+            self._results[idx] = audio_bytes
+            try:
+                if not self._stopped:
+                    with self._emit_lock:
+                        self._emit_ready()
+            except Exception as e:
+                error_logger.error("TTS pipeline emit error for message %s: %s", self.message_id, e, exc_info=True)
+            finally:
+                with self._done:
+                    self._pending -= 1
+                    self._done.notify_all()
+
+    def _emit_ready(self):
+        """
+        Emit every consecutive finished sentence starting at the next expected index.
+        Must be called with the emit lock held.
+        """
+        while self._next_emit_idx in self._results:
+            idx = self._next_emit_idx
+            audio_bytes = self._results.pop(idx)
+            if audio_bytes is None:
+                self._failed = True
+            else:
+                self._audio_parts.append(audio_bytes)
+            self._chunk_seq = emit_audio_chunks(
+                self.socketio, self.user_id, self.message_id, audio_bytes or b'',
+                start_seq=self._chunk_seq, is_final=False,
+                audio_encoding=self.encoding, sentenceIdx=idx, autoPlay=self.auto_play
+            )
+            if audio_bytes and self.first_audio_at is None:
+                self.first_audio_at = time.monotonic()
+            self.socketio.emit('tts:segment:ready', {
+                'messageId': self.message_id,
+                'sentenceIdx': idx,
+                'error': audio_bytes is None,
+                'autoPlay': self.auto_play
+            }, room=self.room)
+            self._next_emit_idx += 1
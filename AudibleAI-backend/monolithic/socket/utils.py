@@ -1,73 +1,207 @@
+import os
 import time
 import base64
 import logging
+from flask import session
 from logging_config import app_logger, error_logger
+from monolithic.socket.client_prefs import get_client_prefs
 from monolithic.utils.text_processing import clean_markdown_for_tts
-from components.tts.google_chirp import generate_tts_audio
+from components.tts.audio_cache import get_tts_audio_bytes
+from components.tts.google_chirp import (
+    AUDIO_ENCODING, AUDIO_MIME_TYPES, MIN_SAMPLE_RATE, MAX_SAMPLE_RATE, get_audio_mime_type
+)
+from components.http_client.admission import UpstreamBusy
+from metrics import socket_emit_seconds, time_to_first_audio_seconds
+from monolithic.services.audio_service import store_message_audio
 
-def stream_tts_audio(socketio, user_id, message_id, text, auto_play=False):
+def stream_tts_audio(socketio, user_id, message_id, text, auto_play=False, received_at=None, cancel_token=None,
+                     encoding=None, sample_rate=None):
     """
     Generate and stream TTS audio for the given text
     auto_play: If True, indicates this is auto-generated TTS that should play automatically
+    received_at: time.monotonic() when the user message arrived, for time-to-first-audio
+    cancel_token: optional CancelToken; synthesis is skipped and streaming stops once it is cancelled
+    encoding/sample_rate: override the format negotiated on user:join (see get_audio_format)
     """
     try:
         user_room = get_user_room(user_id)
+        if cancel_token is not None and cancel_token.cancelled:
+            cancel_token.record_saved('tts_calls')
+            return
         
         # Clean text for TTS
         clean_text = clean_markdown_for_tts(text)
-        app_logger.debug(f"Auto TTS: Cleaned text for message {message_id}")
+        app_logger.debug("Auto TTS: Cleaned text for message %s", message_id)
         
-        # Generate audio
-        audio_b64 = generate_tts_audio(clean_text)
-        audio_bytes = base64.b64decode(audio_b64)
+        # Generate audio (or reuse a cached synthesis of the same text)
+        encoding, sample_rate = get_audio_format(user_id, encoding, sample_rate)
+        mime_type = get_audio_mime_type(encoding)
+        audio_bytes = get_tts_audio_bytes(clean_text, encoding=encoding, sample_rate=sample_rate)
+        store_message_audio(message_id, audio_bytes, mime_type)
         
         # Stream in chunks
-        chunk_size = 8192
-        total_chunks = (len(audio_bytes) + chunk_size - 1) // chunk_size
-        
-        for i in range(total_chunks):
-            chunk = audio_bytes[i*chunk_size:(i+1)*chunk_size]
-            chunk_b64 = base64.b64encode(chunk).decode('utf-8')
-            is_last = i == total_chunks - 1
-            
-            socketio.emit('tts:audio', {
-                'messageId': message_id,
-                'chunkSeq': i,
-                'bytes': chunk_b64,
-                'isLast': is_last,
-                'autoPlay': auto_play
-            }, room=user_room)
-            
-            if is_last:
-                socketio.emit('tts:ready', {
-                    'messageId': message_id,
-                    'autoPlay': auto_play
-                }, room=user_room)
-                app_logger.info(f"Auto TTS: Completed streaming audio for message {message_id}")
-                
+        if received_at is not None and audio_bytes:
+            time_to_first_audio_seconds.observe(time.monotonic() - received_at)
+        emit_audio_chunks(socketio, user_id, message_id, audio_bytes, cancel_token=cancel_token, audio_encoding=encoding, autoPlay=auto_play)
+        if cancel_token is not None and cancel_token.cancelled:
+            app_logger.info("Auto TTS: Streaming cancelled (%s) for message %s", cancel_token.reason, message_id)
+            return
+        socketio.emit('tts:ready', {
+            'messageId': message_id,
+            'autoPlay': auto_play,
+            'mimeType': mime_type
+        }, room=user_room)
+        app_logger.info("Auto TTS: Completed streaming audio for message %s", message_id)
+
+    except UpstreamBusy as e:
+        socketio.emit('tts:error', {
+            'messageId': message_id,
+            'code': 'TTS_BUSY',
+            'message': str(e)
+        }, room=get_user_room(user_id))
     except Exception as e:
-        error_logger.error(f"stream_tts_audio error: {e}", exc_info=True)
+        error_logger.error("stream_tts_audio error: %s", e, exc_info=True)
         socketio.emit('tts:error', {
             'messageId': message_id,
             'code': 'AUTO_TTS_ERROR',
             'message': 'Failed to generate audio'
         }, room=get_user_room(user_id))
 
-def emit_stream_chunks(socketio, user_id, session_id, chunks, delay=0.5):
+# Default tts:audio chunk size per encoding, each about two seconds of speech, so cancellation
+# (checked between chunks) and per-chunk progress behave the same whatever the encoding
+AUDIO_CHUNK_SIZES = {
+    'MP3': 8192,
+    'OGG_OPUS': 4096
+}
+
+def get_audio_transport(user_id):
+    """
+    'binary' sends chunks as Socket.IO binary attachments; 'base64' is the legacy JSON string mode.
+    Clients opt in on user:join, otherwise TTS_TRANSPORT decides. Audio goes to the whole user
+    room, so it is binary only when every connection of the user takes binary.
+    """
+    default = os.getenv('TTS_TRANSPORT', 'base64')
+    transports = [prefs.get('audioTransport') or default for prefs in get_client_prefs(user_id)] or [default]
+    return 'binary' if all(t == 'binary' for t in transports) else 'base64'
+
+def get_audio_chunk_size(encoding=None):
     """
-    Emits AI response chunks to the user room with a delay for readable streaming.
+    TTS_CHUNK_SIZE_<ENCODING> (e.g. TTS_CHUNK_SIZE_OGG_OPUS), then TTS_CHUNK_SIZE, then AUDIO_CHUNK_SIZES.
     """
+    encoding = encoding if encoding in AUDIO_CHUNK_SIZES else AUDIO_ENCODING
+    return int(os.getenv(f'TTS_CHUNK_SIZE_{encoding}') or os.getenv('TTS_CHUNK_SIZE') or AUDIO_CHUNK_SIZES[encoding])
+
+def _parse_sample_rate(value):
     try:
-        room = get_user_room(user_id)
-        for chunk in chunks:
+        rate = int(value)
+    except (TypeError, ValueError):
+        return None
+    return rate if MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE else None
+
+def get_audio_format(user_id, encoding=None, sample_rate=None):
+    """
+    Returns (encoding, sample_rate) for a user's TTS audio.
+    Audio goes to the whole user room, so the encoding must be one every connection listed as
+    `audioFormats` on user:join; connections that announced nothing only count as MP3.
+    An encoding requested for this call is used if TTS_AUDIO_ENCODINGS allows it and all
+    connections can decode it; otherwise the first such encoding in TTS_AUDIO_ENCODINGS
+    (server preference order), falling back to MP3.
+    The sample rate comes from the call, then the highest `sampleRate` if every connection
+    announced one, then TTS_SAMPLE_RATE; None keeps the voice's native rate.
+    """
+    try:
+        allowed = [e.strip().upper() for e in os.getenv('TTS_AUDIO_ENCODINGS', 'OGG_OPUS,MP3').split(',')]
+        connections = get_client_prefs(user_id)
+        # No known connection: only MP3 is safe
+        decodable = set(AUDIO_MIME_TYPES) if connections else {AUDIO_ENCODING}
+        for prefs in connections:
+            announced = prefs.get('audioFormats')
+            decodable &= {str(e).upper() for e in announced} if isinstance(announced, list) else {AUDIO_ENCODING}
+        allowed = [e for e in allowed if e in AUDIO_MIME_TYPES and e in decodable]
+        if not (isinstance(encoding, str) and encoding.upper() in allowed):
+            encoding = next(iter(allowed), AUDIO_ENCODING)
+        rates = [_parse_sample_rate(prefs.get('sampleRate')) for prefs in connections]
+        sample_rate = (
+            _parse_sample_rate(sample_rate)
+            or (max(rates) if rates and all(rates) else None)
+            or _parse_sample_rate(os.getenv('TTS_SAMPLE_RATE'))
+        )
+        return encoding.upper(), sample_rate
+    except Exception as e:
+        error_logger.error("get_audio_format error: %s", e, exc_info=True)
+        return AUDIO_ENCODING, None
+
+def emit_audio_chunks(socketio, user_id, message_id, audio_bytes, start_seq=0, is_final=True, cancel_token=None,
+                      audio_encoding=None, **fields):
+    """
+    Emits audio as `tts:audio` chunks to the user room, sized for `audio_encoding` (see get_audio_chunk_size).
+    Chunks are sliced from a memoryview so the source buffer is never copied as a whole;
+    binary mode hands each slice to Socket.IO as an attachment instead of base64 text.
+    Every chunk carries the `mimeType` clients assemble the playable blob with.
+    With a cancel_token, the loop yields between chunks and stops once it is cancelled.
+    Extra keyword fields are added to every payload. Returns the next chunk sequence number.
+    """
+    room = get_user_room(user_id)
+    transport = get_audio_transport(user_id)
+    chunk_size = get_audio_chunk_size(audio_encoding)
+    mime_type = get_audio_mime_type(audio_encoding)
+    view = memoryview(audio_bytes)
+    total_chunks = (len(view) + chunk_size - 1) // chunk_size
+    seq = start_seq
+    # An empty buffer still needs a terminating chunk when it closes the stream
+    for i in range(max(total_chunks, 1 if is_final else 0)):
+        if cancel_token is not None:
+            # Let tts:stop / disconnect handlers run between chunks
+            socketio.sleep(0)
+            if cancel_token.cancelled:
+                cancel_token.record_saved('audio_bytes', len(view) - i * chunk_size)
+                break
+        chunk = view[i * chunk_size:(i + 1) * chunk_size]
+        start = time.perf_counter()
+        socketio.emit('tts:audio', {
+            'messageId': message_id,
+            'chunkSeq': seq,
+            # python-socketio only detects bytes as binary, so the slice is materialised once here
+            'bytes': chunk.tobytes() if transport == 'binary' else base64.b64encode(chunk).decode('ascii'),
+            'encoding': transport,
+            'isLast': is_final and i >= total_chunks - 1,
+            'mimeType': mime_type,
+            **fields
+        }, room=room)
+        socket_emit_seconds.observe(time.perf_counter() - start, event='tts:audio')
+        seq += 1
+    return seq
+
+def emit_stream_chunk(socketio, user_id, session_id, chunk):
+    """
+    Emits a single AI response chunk to the user room as soon as it is available.
+    """
+    try:
+        with socket_emit_seconds.time(event='ai:response:chunk'):
             socketio.emit('ai:response:chunk', {
                 'session_id': session_id,
                 'chunk': chunk
-            }, room=room)
-            socketio.sleep(delay)
-        app_logger.info(f"Emitted {len(chunks)} AI response chunks to user_id: {user_id}, session_id: {session_id}")
+            }, room=get_user_room(user_id))
     except Exception as e:
-        error_logger.error(f"emit_stream_chunks error: {e}", exc_info=True)
+        error_logger.error("emit_stream_chunk error: %s", e, exc_info=True)
+
+def is_socket_auth_required():
+    return os.getenv('SOCKET_REQUIRE_AUTH', 'true').lower() in ('1', 'true', 'yes')
+
+def get_socket_user_id(claimed_user_id=None):
+    """
+    Returns the identity verified at connect time and cached on the Socket.IO session,
+    so event handlers never re-verify the JWT. The user id sent in the event payload is
+    only trusted for unauthenticated connections when SOCKET_REQUIRE_AUTH is off.
+    """
+    user_id = session.get('user_id')
+    if user_id:
+        if claimed_user_id and str(claimed_user_id) != str(user_id):
+            app_logger.warning("Socket payload user id %s ignored for authenticated user %s", claimed_user_id, user_id)
+        return user_id
+    if is_socket_auth_required():
+        return None
+    return claimed_user_id
 
 def get_user_room(user_id):
     """
@@ -76,7 +210,7 @@ def get_user_room(user_id):
     try:
         return str(user_id)
     except Exception as e:
-        error_logger.error(f"get_user_room error: {e}", exc_info=True)
+        error_logger.error("get_user_room error: %s", e, exc_info=True)
         return "unknown"
 
 def emit_response_end(socketio, user_id, session_id, ai_msg_id, ai_text):
@@ -85,14 +219,29 @@ def emit_response_end(socketio, user_id, session_id, ai_msg_id, ai_text):
     """
     try:
         room = get_user_room(user_id)
-        socketio.emit('ai:response:end', {
+        with socket_emit_seconds.time(event='ai:response:end'):
+            socketio.emit('ai:response:end', {
+                'session_id': session_id,
+                'message': {
+                    'id': ai_msg_id,
+                    'sender': 'AI',
+                    'text': ai_text
+                }
+            }, room=room)
+        app_logger.info("Emitted AI response end to user_id: %s, session_id: %s", user_id, session_id)
+    except Exception as e:
+        error_logger.error("emit_response_end error: %s", e, exc_info=True)
+
+def emit_response_error(socketio, user_id, session_id, code, message):
+    """
+    Tells the client the AI reply failed (e.g. BUSY when admission control shed it).
+    """
+    try:
+        socketio.emit('ai:response:error', {
             'session_id': session_id,
-            'message': {
-                'id': ai_msg_id,
-                'sender': 'AI',
-                'text': ai_text
-            }
-        }, room=room)
-        app_logger.info(f"Emitted AI response end to user_id: {user_id}, session_id: {session_id}")
+            'code': code,
+            'message': message
+        }, room=get_user_room(user_id))
+        app_logger.info("Emitted AI response error %s to user_id: %s, session_id: %s", code, user_id, session_id)
     except Exception as e:
-        error_logger.error(f"emit_response_end error: {e}", exc_info=True)
+        error_logger.error("emit_response_error error: %s", e, exc_info=True)
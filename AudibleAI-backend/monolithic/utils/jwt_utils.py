@@ -1,32 +1,125 @@
-from flask import current_app, jsonify
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, g, request
 import jwt
 import logging
 from logging_config import app_logger, error_logger
 
-def get_jwt_user_id(request):
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified tokens, keyed by SHA-256 of the token.
+    Entries expire after `ttl` seconds or at the token's own `exp`, whichever is first,
+    so a cached token is never accepted past its expiry.
+    """
+
+    def __init__(self, max_size=10000, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token hash -> (user_id, expires_at)
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def get(self, token_hash):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None and now < entry[1]:
+                self._entries.move_to_end(token_hash)
+                self._counters['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[token_hash]
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, token_hash, user_id, exp=None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[token_hash] = (user_id, expires_at)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'size': len(self._entries)}
+
+
+token_cache = VerifiedTokenCache(
+    max_size=int(os.getenv('JWT_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('JWT_CACHE_TTL', 300))
+)
+
+
+def get_bearer_token(req):
+    return req.headers.get('Authorization', '').replace('Bearer ', '')
+
+
+def verify_jwt_token(token):
+    """
+    Verifies a token (signature and exp) and returns its user_id, or None if invalid.
+    Each distinct token is decoded once; repeats are served from the verified-token cache.
+    """
+    if not token:
+        return None
+    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    user_id = token_cache.get(token_hash)
+    if user_id is not None:
+        return user_id
     try:
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError as e:
+        app_logger.warning("JWT rejected: %s", e)
+        return None
+    user_id = payload.get('user_id')
+    if user_id:
+        token_cache.put(token_hash, user_id, payload.get('exp'))
+    return user_id
+
+
+def require_auth(view):
+    """
+    Rejects requests without a valid bearer token and puts the caller's id on g.user_id.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = get_bearer_token(request)
         if not token:
-            app_logger.warning("Missing token in get_jwt_user_id")
+            app_logger.warning("Missing token")
             return jsonify({'error': 'Missing token'}), 400
-        if not is_jwt_valid(token):
-            app_logger.warning("Invalid token in get_jwt_user_id")
+        user_id = verify_jwt_token(token)
+        if not user_id:
             return jsonify({'error': 'Invalid token'}), 401
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        app_logger.info(f"JWT decoded for user_id: {payload.get('user_id')}")
-        return payload['user_id']
+        g.user_id = user_id
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def get_jwt_user_id(request):
+    """
+    Returns the user_id of the request's bearer token, or None if missing or invalid.
+    """
+    try:
+        return verify_jwt_token(get_bearer_token(request))
     except Exception as e:
-        error_logger.error(f"get_jwt_user_id error: {e}", exc_info=True)
+        error_logger.error("get_jwt_user_id error: %s", e, exc_info=True)
         return None
 
+
 def is_jwt_valid(token):
     """
     Checks if a JWT token is valid and not expired.
     Returns True if valid, False otherwise.
     """
     try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return True
+        return verify_jwt_token(token) is not None
     except Exception as e:
-        error_logger.error(f"is_jwt_valid error: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        error_logger.error("is_jwt_valid error: %s", e, exc_info=True)
+        return False
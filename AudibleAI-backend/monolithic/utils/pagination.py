@@ -0,0 +1,34 @@
+import base64
+import datetime
+
+def encode_cursor(created_at, row_id):
+    """
+    Opaque keyset cursor for a (created_at, id) position.
+    """
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Returns (created_at, id) for a cursor produced by encode_cursor.
+    Raises ValueError for malformed cursors.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|', 1)
+        return datetime.datetime.fromisoformat(created_at), row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def parse_page_limit(value, default=50, maximum=200):
+    """
+    Parses a ?limit= query value, clamped to [1, maximum].
+    Raises ValueError when it is not an integer.
+    """
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, maximum))
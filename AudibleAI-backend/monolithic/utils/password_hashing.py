@@ -0,0 +1,83 @@
+import os
+import threading
+from eventlet import patcher, tpool
+from werkzeug.security import generate_password_hash, check_password_hash
+import logging
+from logging_config import app_logger
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the hashing queue is full; callers should answer 503 rather than wait.
+    """
+    pass
+
+
+def get_hash_method():
+    """
+    Werkzeug method string in full form (e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:1000000'),
+    so it can be compared with the prefix of stored hashes.
+    """
+    return os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+
+def needs_rehash(pwhash):
+    """
+    True when a stored hash was made with different parameters than the configured ones.
+    """
+    return pwhash.split('$', 1)[0] != get_hash_method()
+
+
+class PasswordHashPool:
+    """
+    Runs password hashing and verification off the eventlet hub.
+
+    Key derivation is pure CPU; inside a greenlet it freezes the hub and every open socket
+    stream with it. Jobs run on eventlet's native thread pool instead; hashlib's scrypt and
+    PBKDF2 release the GIL, so they run in parallel with the hub and with each other.
+    At most `workers` jobs run at once and `max_pending` more may wait; beyond that callers
+    get PasswordHasherBusy after `queue_timeout` seconds.
+    """
+
+    def __init__(self, workers, max_pending=32, queue_timeout=2.0):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._running = threading.BoundedSemaphore(max(workers, 1))
+        self._admitted = threading.BoundedSemaphore(max(workers, 1) + max_pending)
+        self._lock = threading.Lock()
+        self._counters = {'completed': 0, 'rejected': 0}
+
+    def _run(self, fn, *args, **kwargs):
+        # Outside eventlet (CLI scripts, the dev server) there is no hub to protect
+        if self.workers <= 0 or not patcher.is_monkey_patched('thread'):
+            return fn(*args, **kwargs)
+        if not self._admitted.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._counters['rejected'] += 1
+            app_logger.warning("Password hash pool saturated, rejecting request")
+            raise PasswordHasherBusy("Password hashing queue is full")
+        try:
+            with self._running:
+                result = tpool.execute(fn, *args, **kwargs)
+            with self._lock:
+                self._counters['completed'] += 1
+            return result
+        finally:
+            self._admitted.release()
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, method=get_hash_method())
+
+    def verify_password(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+password_hasher = PasswordHashPool(
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))),
+    max_pending=int(os.getenv('PASSWORD_HASH_QUEUE', 32)),
+    queue_timeout=float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+)
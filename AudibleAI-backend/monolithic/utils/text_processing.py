@@ -1,48 +1,194 @@
+import os
+import re
+from functools import lru_cache
 from markdown_it import MarkdownIt
 from mdit_plain.renderer import RendererPlain
-import re
+from metrics import markdown_clean_seconds
+
+# Common symbols spoken as words. No token shares a character with another or with any
+# spoken form, so replacing them all in one pass gives the same text as one at a time.
+SPOKEN_SYMBOLS = {
+    '/': ' slash ',
+    '\\': ' backslash ',
+    '=': ' equals ',
+    '>': ' greater than ',
+    '<': ' less than ',
+    '{}': ' curly braces ',
+    '()': ' parentheses ',
+    '[]': ' square brackets '
+}
+# Abbreviations can overlap (`i.e.g.`), so they are applied one after another in this order
+SPOKEN_ABBREVIATIONS = {
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+    'etc.': 'etcetera'
+}
+# Every replacement, in the order they take effect
+SPOKEN_REPLACEMENTS = {**SPOKEN_SYMBOLS, **SPOKEN_ABBREVIATIONS}
+
+class MarkdownSpeechNormalizer:
+    """
+    Converts markdown to plain text suitable for TTS.
+
+    The markdown parser and all patterns are built once and reused. Symbols are replaced in
+    a single pass over one compiled alternation, then abbreviations one by one in
+    SPOKEN_ABBREVIATIONS order, which matches applying SPOKEN_REPLACEMENTS in order. Results are memoised
+    in an LRU keyed on the input text, since the same message is cleaned for auto TTS,
+    replays and per-sentence synthesis.
+    """
+
+    def __init__(self, cache_size=1024):
+        self._parser = MarkdownIt(renderer_cls=RendererPlain)
+        self._punctuation_spacing = re.compile(r'\s+([.,!?])')
+        self._symbols = re.compile('|'.join(re.escape(t) for t in SPOKEN_SYMBOLS))
+        self._replace_symbol = lambda m: SPOKEN_SYMBOLS[m.group()]
+        self._cached_normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _normalize(self, markdown_text):
+        # Convert markdown to plain text
+        text = self._parser.render(markdown_text)
+        # Fix spacing around punctuation
+        text = self._punctuation_spacing.sub(r'\1', text)
+        # Replace common symbols with spoken words
+        text = self._symbols.sub(self._replace_symbol, text)
+        for abbreviation, spoken in SPOKEN_ABBREVIATIONS.items():
+            text = text.replace(abbreviation, spoken)
+        # Normalize whitespace
+        return ' '.join(text.split())
+
+    def normalize(self, markdown_text):
+        """
+        Args:
+            markdown_text (str): The markdown text to process
+
+        Returns:
+            str: Clean plain text suitable for TTS
+        """
+        return self._cached_normalize(markdown_text)
+
+    def normalize_batch(self, texts):
+        """
+        Normalise many texts (e.g. the sentences of one reply) at once; duplicates are computed once.
+
+        Args:
+            texts (list[str]): Markdown texts
+
+        Returns:
+            list[str]: Clean plain texts, in input order
+        """
+        results = {}
+        for text in texts:
+            if text not in results:
+                results[text] = self._cached_normalize(text)
+        return [results[text] for text in texts]
+
+    def cache_info(self):
+        return self._cached_normalize.cache_info()
+
+normalizer = MarkdownSpeechNormalizer(cache_size=int(os.getenv('TTS_NORMALIZER_CACHE_SIZE', 1024)))
 
 def clean_markdown_for_tts(markdown_text):
     """
     Convert markdown to plain text suitable for TTS processing.
-    Uses mdit_plain renderer for efficient markdown to plain text conversion.
-    
+    Uses the shared MarkdownSpeechNormalizer (reused parser, precompiled replacements, memoised).
+
     Args:
         markdown_text (str): The markdown text to process
-        
+
     Returns:
         str: Clean plain text suitable for TTS
     """
-    # Initialize markdown parser with plain text renderer
-    parser = MarkdownIt(renderer_cls=RendererPlain)
-    
-    # Convert markdown to plain text
-    text = parser.render(markdown_text)
-    
-    # Clean up any remaining artifacts
-    
-    # Fix spacing around punctuation
-    text = re.sub(r'\s+([.,!?])', r'\1', text)
-    
-    # Replace common symbols with spoken words
-    replacements = {
-        '/': ' slash ',
-        '\\': ' backslash ',
-        '=': ' equals ',
-        '>': ' greater than ',
-        '<': ' less than ',
-        '{}': ' curly braces ',
-        '()': ' parentheses ',
-        '[]': ' square brackets ',
-        'e.g.': 'for example',
-        'i.e.': 'that is',
-        'etc.': 'etcetera'
-    }
-    
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    
-    # Normalize whitespace
-    text = ' '.join(text.split())
-    
-    return text.strip()
+    with markdown_clean_seconds.time():
+        return normalizer.normalize(markdown_text)
+
+def clean_markdown_batch_for_tts(markdown_texts):
+    """
+    Batch form of clean_markdown_for_tts.
+
+    Args:
+        markdown_texts (list[str]): The markdown texts to process
+
+    Returns:
+        list[str]: Clean plain texts, in input order
+    """
+    return normalizer.normalize_batch(markdown_texts)
+
+# Same pattern as splitIntoSentences in the frontend, so sentence indexes line up with highlighting
+SENTENCE_PATTERN = re.compile(r'[^.!?]+[.!?]+')
+
+def split_into_sentences(text):
+    """
+    Split text into sentences exactly like the frontend's splitIntoSentences.
+
+    Args:
+        text (str): The text to split
+
+    Returns:
+        list[str]: Sentences in order, the unterminated tail (if any) last
+    """
+    if not text:
+        return []
+    segmenter = SentenceSegmenter()
+    return segmenter.feed(text) + segmenter.flush()
+
+class SentenceSegmenter:
+    """
+    Incremental sentence splitter for streamed text.
+    A sentence is only released once a character after its terminators has arrived,
+    because the terminator run (e.g. '?!' or '...') may continue in the next chunk.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+
+    def feed(self, chunk):
+        """
+        Add a chunk of text and return the sentences it completed.
+        """
+        self._buffer += chunk
+        sentences = []
+        consumed = 0
+        for match in SENTENCE_PATTERN.finditer(self._buffer):
+            if match.end() == len(self._buffer):
+                break
+            sentences.append(match.group())
+            consumed = match.end()
+        self._buffer = self._buffer[consumed:]
+        return sentences
+
+    def flush(self):
+        """
+        Return whatever is left once the stream has ended.
+        """
+        matches = list(SENTENCE_PATTERN.finditer(self._buffer))
+        sentences = [m.group() for m in matches]
+        last_end = matches[-1].end() if matches else 0
+        remaining = self._buffer[last_end:].strip()
+        if remaining:
+            sentences.append(remaining)
+        self._buffer = ''
+        return sentences
+
+TITLE_NOISE_PATTERN = re.compile(r'[`*_#>\[\]{}()~|"]+')
+
+def heuristic_title(text, max_words=6, max_length=60):
+    """
+    Instant placeholder title from the user's first message, used until the LLM title is ready.
+
+    Args:
+        text (str): The user's message
+        max_words (int): Maximum number of words to keep
+        max_length (int): Maximum title length in characters
+
+    Returns:
+        str: A short title, or 'New Chat' if nothing usable remains
+    """
+    words = TITLE_NOISE_PATTERN.sub(' ', text or '').split()
+    if not words:
+        return 'New Chat'
+    title = ' '.join(words[:max_words]).rstrip('.,!?;:')
+    if len(title) > max_length:
+        title = title[:max_length].rsplit(' ', 1)[0]
+    if len(title) < len(' '.join(words)):
+        title += '...'
+    return title[0].upper() + title[1:]
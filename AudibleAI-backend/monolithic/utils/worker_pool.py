@@ -0,0 +1,62 @@
+import queue
+import threading
+import logging
+from logging_config import app_logger, error_logger
+
+
+class BoundedWorkerPool:
+    """
+    Fixed number of workers fed from a bounded queue.
+    Uses threading/queue primitives, which are green under eventlet, so a handful of
+    slow jobs can never occupy more than `max_workers` greenlets; when the queue is full,
+    submit() refuses the job instead of piling up work.
+    """
+
+    def __init__(self, name, max_workers=2, max_queue=100):
+        self.name = name
+        self.max_workers = max_workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._counters = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._run, name=f"{self.name}-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a job. Returns False (and runs nothing) when the queue is full.
+        """
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((fn, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self._counters['rejected'] += 1
+            app_logger.warning("%s pool queue full, job rejected", self.name)
+            return False
+        with self._lock:
+            self._counters['submitted'] += 1
+        return True
+
+    def _run(self):
+        while True:
+            fn, args, kwargs = self._queue.get()
+            try:
+                fn(*args, **kwargs)
+                with self._lock:
+                    self._counters['completed'] += 1
+            except Exception as e:
+                with self._lock:
+                    self._counters['failed'] += 1
+                error_logger.error("%s pool job error: %s", self.name, e, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'queued': self._queue.qsize(), 'workers': len(self._workers)}
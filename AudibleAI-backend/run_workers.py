@@ -0,0 +1,155 @@
+"""
+Runs N server.py workers on consecutive ports, sharing one Socket.IO message queue.
+
+Each worker is a single eventlet process (one core); emits go through SOCKETIO_MESSAGE_QUEUE,
+so a reply or title update reaches the user whichever worker their socket is connected to.
+Socket.IO's long-polling transport needs every request of a connection to hit the same
+worker, so the load balancer in front must route sticky, e.g. nginx `ip_hash` or
+`hash $cookie_<name> consistent` (print a ready-made block with --nginx).
+
+Usage (from AudibleAI-backend/):
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 python run_workers.py --workers 4 [--base-port 5000]
+    python run_workers.py --workers 4 --nginx > audibleai-upstream.conf
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from logging_config import app_logger, error_logger
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NGINX_TEMPLATE = """# Sticky routing for {workers} AudibleAI workers (Socket.IO polling requires it)
+upstream audibleai_workers {{
+    ip_hash;
+{servers}
+}}
+
+map $http_upgrade $connection_upgrade {{
+    default upgrade;
+    ''      close;
+}}
+
+server {{
+    listen 80;
+
+    location / {{
+        proxy_pass http://audibleai_workers;
+        proxy_http_version 1.1;
+        proxy_set_header Host $host;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection $connection_upgrade;
+        proxy_read_timeout 120s;
+        proxy_buffering off;
+    }}
+}}
+"""
+
+
+def nginx_config(workers, base_port, host='127.0.0.1'):
+    servers = '\n'.join(f'    server {host}:{base_port + i};' for i in range(workers))
+    return NGINX_TEMPLATE.format(workers=workers, servers=servers)
+
+
+class Worker:
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = 1.0
+        self.restart_at = None
+
+    def start(self):
+        env = {**os.environ, 'PORT': str(self.port), 'WORKER_ID': str(self.index)}
+        self.process = subprocess.Popen([sys.executable, 'server.py'], cwd=BACKEND_DIR, env=env)
+        self.started_at = time.monotonic()
+        app_logger.info("Worker %s started on port %s (pid %s)", self.index, self.port, self.process.pid)
+
+
+class WorkerSupervisor:
+    """
+    Starts the workers, restarts any that exit (with exponential backoff, reset after a
+    minute of uptime) and forwards SIGTERM/SIGINT so each worker flushes its queued writes.
+    """
+
+    def __init__(self, workers, base_port, grace=20.0):
+        self.workers = [Worker(i, base_port + i) for i in range(workers)]
+        self.grace = grace
+        self.stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        for worker in self.workers:
+            worker.start()
+        while not self.stopping:
+            self._check()
+            time.sleep(0.5)
+        self._shutdown()
+
+    def _on_signal(self, signum, frame):
+        app_logger.info("Supervisor received signal %s, stopping workers", signum)
+        self.stopping = True
+
+    def _check(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    worker.restart_at = None
+                    worker.restarts += 1
+                    worker.start()
+                continue
+            code = worker.process.poll()
+            if code is None:
+                if now - worker.started_at > 60:
+                    worker.backoff = 1.0
+                continue
+            error_logger.error("Worker %s (port %s) exited with code %s, restarting in %.0fs", worker.index, worker.port, code, worker.backoff)
+            worker.restart_at = now + worker.backoff
+            worker.backoff = min(worker.backoff * 2, 30.0)
+
+    def _shutdown(self):
+        running = [w for w in self.workers if w.process is not None and w.process.poll() is None]
+        for worker in running:
+            worker.process.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.grace
+        for worker in running:
+            try:
+                worker.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                app_logger.warning("Worker %s did not stop within %.0fs, killing it", worker.index, self.grace)
+                worker.process.kill()
+        app_logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--base-port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--grace', type=float, default=20.0, help='seconds to wait for workers on shutdown')
+    parser.add_argument('--nginx', action='store_true', help='print a sticky nginx config for the workers and exit')
+    args = parser.parse_args()
+
+    if args.nginx:
+        print(nginx_config(args.workers, args.base_port), end='')
+        return
+    if args.workers > 1 and not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+        parser.error("SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) is required for more than one worker")
+
+    ports = ', '.join(str(args.base_port + i) for i in range(args.workers))
+    print(f"Starting {args.workers} worker(s) on ports {ports}; route to them with sticky sessions (see --nginx)")
+    WorkerSupervisor(args.workers, args.base_port, args.grace).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,19 +5,30 @@ patch_psycopg()
 
 import os
 import sys
+import uuid
+import signal
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Load .env before any module reads its settings at import time (logging, pools)
+from dotenv import load_dotenv
+load_dotenv()
+
 from logging_config import app_logger, error_logger
-from flask import Flask
+from flask import Flask, g, request
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from dotenv import load_dotenv
-from components.postgres.postgres_conn_utils import init_db
+from components.postgres.postgres_conn_utils import init_db, get_pool_stats
+from components.tts.audio_cache import get_tts_cache_stats
+from components.http_client.upstream_client import get_upstream_stats
+from components.http_client.admission import get_admission_stats
+from components.llm_models.response_cache import get_llm_cache_stats
+from components.postgres.write_behind import shutdown_write_behind
+from metrics import register_stats, render_metrics
 from monolithic.routes.auth_routes import auth_bp
 from monolithic.routes.chat_routes import chat_bp
 from monolithic.socket.events import register_socket_events
-
-load_dotenv()
+from monolithic.socket.emitter import init_emitter, get_message_queue_url, get_message_queue_channel
+from monolithic.socket.cancellation import job_registry
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -37,21 +48,84 @@ socketio = SocketIO(
     cors_allowed_origins="*",
     ping_timeout=20,
     ping_interval=10,
-    async_mode='eventlet'
+    async_mode='eventlet',
+    # With several workers, emits go through the queue so they reach clients on any worker
+    message_queue=get_message_queue_url(),
+    channel=get_message_queue_channel()
 )
-sys.modules['server_socketio'] = socketio # Make socketio available for services
+init_emitter(socketio)
 
 # Push an application context before registering events
 with app.app_context():
     # Register socket events
     register_socket_events(socketio)
 
+# Connection pool stats
+@app.route('/health/db', methods=['GET'])
+def db_health():
+    return get_pool_stats(), 200
+
+# TTS audio cache stats
+@app.route('/health/tts-cache', methods=['GET'])
+def tts_cache_health():
+    return get_tts_cache_stats(), 200
+
+# LLM response cache stats
+@app.route('/health/llm-cache', methods=['GET'])
+def llm_cache_health():
+    return get_llm_cache_stats(), 200
+
+# Gemini / TTS client retries and latency
+@app.route('/health/upstreams', methods=['GET'])
+def upstreams_health():
+    return get_upstream_stats(), 200
+
+# Gemini / TTS concurrency permits, queue depth and wait times
+@app.route('/health/admission', methods=['GET'])
+def admission_health():
+    return get_admission_stats(), 200
+
+# Running chat/TTS jobs and how many were cancelled
+@app.route('/health/jobs', methods=['GET'])
+def jobs_health():
+    return job_registry.stats(), 200
+
+# Prometheus scrape endpoint: latency histograms plus the stats above as gauges
+register_stats('audibleai_db_pool', get_pool_stats)
+register_stats('audibleai_tts_cache', get_tts_cache_stats)
+register_stats('audibleai_llm_cache', get_llm_cache_stats)
+register_stats('audibleai_upstream', get_upstream_stats, label='upstream')
+register_stats('audibleai_admission', get_admission_stats, label='upstream')
+register_stats('audibleai_jobs', job_registry.stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+# Correlate every log line of a request; honour an upstream proxy's id
+@app.before_request
+def assign_request_id():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+@app.after_request
+def return_request_id(response):
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
 # Flask error handler
 @app.errorhandler(Exception)
 def handle_exception(e):
-    error_logger.error(f"Unhandled Exception: {e}", exc_info=True)
+    error_logger.error("Unhandled Exception: %s", e, exc_info=True)
     return {"error": str(e)}, 500
 
+def handle_shutdown(signum, frame):
+    # Flush batched background writes before the process goes away
+    app_logger.info("Received signal %s, shutting down", signum)
+    shutdown_write_behind()
+    sys.exit(0)
+
 if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, handle_shutdown)
     app_logger.info("Starting Flask server...")
     socketio.run(app, host='0.0.0.0', port=os.getenv('PORT', 5000))
\ No newline at end of file
@@ -0,0 +1,17 @@
+import os
+import sys
+import types
+import tempfile
+import importlib.util
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Keep test runs from writing into the backend's logs/ directory
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='audibleai-test-logs-'))
+
+# Code imports `components.*`, which resolves to Components/ on case-insensitive filesystems only
+if importlib.util.find_spec('components') is None:
+    components = types.ModuleType('components')
+    components.__path__ = [os.path.join(BACKEND_DIR, 'Components')]
+    sys.modules['components'] = components
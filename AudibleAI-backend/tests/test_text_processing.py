@@ -0,0 +1,56 @@
+import re
+import pytest
+from markdown_it import MarkdownIt
+from mdit_plain.renderer import RendererPlain
+from monolithic.utils.text_processing import MarkdownSpeechNormalizer, clean_markdown_for_tts
+
+
+def baseline_clean_markdown_for_tts(markdown_text):
+    """
+    The original implementation: a fresh parser and str.replace in dict order.
+    """
+    text = MarkdownIt(renderer_cls=RendererPlain).render(markdown_text)
+    text = re.sub(r'\s+([.,!?])', r'\1', text)
+    replacements = {
+        '/': ' slash ',
+        '\\': ' backslash ',
+        '=': ' equals ',
+        '>': ' greater than ',
+        '<': ' less than ',
+        '{}': ' curly braces ',
+        '()': ' parentheses ',
+        '[]': ' square brackets ',
+        'e.g.': 'for example',
+        'i.e.': 'that is',
+        'etc.': 'etcetera'
+    }
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    return ' '.join(text.split()).strip()
+
+
+SAMPLES = [
+    'i.e.g. test',
+    'e.g.i.e. and i.e.e.g. and etc.g. and e.g.etc.',
+    'Paths like src/app/main.py or C:\\Users\\me, a => b, a <= b, x == y',
+    'Call f() or g(()) with [] and {} and [[]] and {{}}',
+    '## Heading\n\nSome **bold** text, e.g. this , and *that* .\n\n- item one\n- item two etc.',
+    'Use `a/b` in [the docs](https://example.com/a/b?x=1) i.e. here.',
+    '',
+]
+
+
+@pytest.mark.parametrize('markdown_text', SAMPLES)
+def test_matches_baseline_replacement_order(markdown_text):
+    assert MarkdownSpeechNormalizer(cache_size=0).normalize(markdown_text) == baseline_clean_markdown_for_tts(markdown_text)
+
+
+def test_overlapping_abbreviations_apply_in_order():
+    # 'e.g.' is replaced before 'i.e.', as the original replacement loop did
+    assert clean_markdown_for_tts('i.e.g. test') == 'i.for example test'
+
+
+def test_batch_matches_single_calls():
+    normalizer = MarkdownSpeechNormalizer()
+    texts = ['a/b.', 'i.e. x', 'a/b.']
+    assert normalizer.normalize_batch(texts) == [normalizer.normalize(t) for t in texts]
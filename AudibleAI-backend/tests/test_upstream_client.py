@@ -0,0 +1,180 @@
+import time
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from components.http_client.upstream_client import UpstreamClient
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        status, headers, delay = self.server.next_response(self.client_address)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps({'status': status}).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class ScriptedServer(ThreadingHTTPServer):
+    """
+    Answers requests with the scripted (status, headers, delay) tuples in order, then 200s,
+    and records the client address of every request.
+    """
+    daemon_threads = True
+
+    def __init__(self, responses):
+        super().__init__(('127.0.0.1', 0), ScriptedHandler)
+        self.responses = list(responses)
+        self.clients = []
+        self._lock = threading.Lock()
+
+    def next_response(self, client_address):
+        with self._lock:
+            self.clients.append(client_address)
+            return self.responses.pop(0) if self.responses else (200, {}, 0)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1/test'
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(*responses):
+        server = ScriptedServer(responses)
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_client(**kwargs):
+    options = {'connect_timeout': 1.0, 'read_timeout': 2.0, 'max_retries': 2, 'backoff_base': 0.01, 'backoff_max': 0.05}
+    options.update(kwargs)
+    return UpstreamClient('test', **options)
+
+
+def spy_backoff(monkeypatch, client):
+    delays = []
+    backoff = client._backoff
+
+    def record(attempt, response=None):
+        delay = backoff(attempt, response)
+        delays.append(delay)
+        return delay
+
+    monkeypatch.setattr(client, '_backoff', record)
+    return delays
+
+
+def test_retries_429_and_503_with_backoff_then_succeeds(stub_server, monkeypatch):
+    server = stub_server((429, {'Retry-After': '0'}, 0), (503, {}, 0))
+    client = make_client()
+    delays = spy_backoff(monkeypatch, client)
+
+    response = client.post(server.url, json={'q': 1})
+
+    assert response.status_code == 200
+    assert len(server.clients) == 3
+    # Retry-After is honoured, otherwise jittered exponential backoff capped by backoff_max
+    assert delays[0] == 0.0
+    assert 0.0 <= delays[1] <= 0.02
+    stats = client.stats()
+    assert (stats['requests'], stats['retries'], stats['errors']) == (3, 2, 2)
+    assert 'latency_ms_p50' in stats
+
+
+def test_returns_last_error_response_when_retries_are_exhausted(stub_server):
+    server = stub_server(*[(503, {}, 0)] * 3)
+    client = make_client()
+
+    response = client.post(server.url, json={})
+
+    assert response.status_code == 503
+    assert len(server.clients) == 3
+    assert client.stats()['retries'] == 2
+
+
+@pytest.mark.parametrize('status', [400, 401, 404])
+def test_client_errors_are_not_retried(stub_server, status):
+    server = stub_server((status, {}, 0))
+    client = make_client()
+
+    response = client.post(server.url, json={})
+
+    assert response.status_code == status
+    assert len(server.clients) == 1
+    stats = client.stats()
+    assert (stats['requests'], stats['retries'], stats['errors']) == (1, 0, 0)
+
+
+def test_read_timeout_is_retried_then_raised(stub_server):
+    server = stub_server(*[(200, {}, 0.5)] * 2)
+    client = make_client(read_timeout=0.1, max_retries=1)
+
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.post(server.url, json={})
+
+    assert time.monotonic() - start < 1.0
+    assert len(server.clients) == 2
+    stats = client.stats()
+    assert (stats['requests'], stats['retries'], stats['errors']) == (2, 1, 2)
+
+
+def test_read_timeout_then_success(stub_server):
+    server = stub_server((200, {}, 0.5))
+    client = make_client(read_timeout=0.1)
+
+    response = client.post(server.url, json={})
+
+    assert response.status_code == 200
+    assert len(server.clients) == 2
+    assert client.stats()['retries'] == 1
+
+
+def test_reuses_one_connection_across_calls(stub_server):
+    server = stub_server()
+    client = make_client()
+
+    for i in range(5):
+        assert client.post(server.url, json={'i': i}).status_code == 200
+
+    assert len(server.clients) == 5
+    # Same client port on every request: one kept-alive TCP connection
+    assert len(set(server.clients)) == 1
+
+
+def test_connection_is_reused_after_a_retried_error(stub_server):
+    server = stub_server((503, {}, 0))
+    client = make_client()
+
+    client.post(server.url, json={})
+    client.post(server.url, json={})
+
+    assert len(server.clients) == 3
+    assert len(set(server.clients)) == 1
@@ -1,6 +1,13 @@
 import { useState, useEffect, useRef } from "react";
 import { splitIntoSentences } from "../utils/textSegmentation";
 import { cacheAudio, getCachedAudio } from "../utils/audioCache";
+import { DEFAULT_AUDIO_MIME_TYPE } from "../utils/audioFormats";
+
+// Audio chunks arrive either as binary attachments (ArrayBuffer) or legacy base64 strings
+const decodeAudioChunk = (chunk) =>
+	typeof chunk === "string"
+		? Uint8Array.from(atob(chunk), (c) => c.charCodeAt(0))
+		: new Uint8Array(chunk);
 
 /**
  * Hook to manage audio playback and text highlighting
@@ -8,6 +15,7 @@ import { cacheAudio, getCachedAudio } from "../utils/audioCache";
 export const useAudioPlayback = () => {
 	const audioRef = useRef(null);
 	const audioChunksRef = useRef(new Map()); // Map to store chunks per message
+	const audioMimeTypesRef = useRef(new Map()); // Encoding the server chose per message
 	const [currentMessageId, setCurrentMessageId] = useState(null);
 	const [isPaused, setIsPaused] = useState(false);
 	const [highlightedSentenceIdx, setHighlightedSentenceIdx] = useState(null);
@@ -103,12 +111,8 @@ export const useAudioPlayback = () => {
 					chunks.push(data.bytes);
 					if (data.isLast) {
 						const audioBlob = new Blob(
-							chunks.map((b64) =>
-								Uint8Array.from(atob(b64), (c) =>
-									c.charCodeAt(0)
-								)
-							),
-							{ type: "audio/mp3" }
+							chunks.map(decodeAudioChunk),
+							{ type: data.mimeType || DEFAULT_AUDIO_MIME_TYPE }
 						);
 						cacheAudio(messageId, audioBlob);
 						cleanup();
@@ -251,12 +255,15 @@ export const useAudioPlayback = () => {
 	};
 
 	// Add chunk to audio assembly for a specific message
-	const addAudioChunk = (chunk, messageId) => {
+	const addAudioChunk = (chunk, messageId, mimeType) => {
 		if (!messageId) return;
 		if (!audioChunksRef.current.has(messageId)) {
 			audioChunksRef.current.set(messageId, []);
 		}
 		audioChunksRef.current.get(messageId).push(chunk);
+		if (mimeType) {
+			audioMimeTypesRef.current.set(messageId, mimeType);
+		}
 	};
 
 	// Finalize audio assembly and start playback
@@ -265,12 +272,11 @@ export const useAudioPlayback = () => {
 		const chunks = audioChunksRef.current.get(messageId);
 		if (chunks.length === 0) return;
 
-		const audioBlob = new Blob(
-			chunks.map((b64) =>
-				Uint8Array.from(atob(b64), (c) => c.charCodeAt(0))
-			),
-			{ type: "audio/mp3" }
-		);
+		const audioBlob = new Blob(chunks.map(decodeAudioChunk), {
+			type:
+				audioMimeTypesRef.current.get(messageId) ||
+				DEFAULT_AUDIO_MIME_TYPE,
+		});
 
 		// Cache the assembled audio
 		await cacheAudio(messageId, audioBlob);
@@ -284,6 +290,7 @@ export const useAudioPlayback = () => {
 
 		// Clear chunks for this message
 		audioChunksRef.current.delete(messageId);
+		audioMimeTypesRef.current.delete(messageId);
 	};
 
 	// Cleanup
@@ -0,0 +1,24 @@
+// TTS encodings the server can produce, most compact first, with what to probe the browser for
+
+const AUDIO_FORMATS = [
+	{ encoding: "OGG_OPUS", probe: 'audio/ogg; codecs="opus"' },
+	{ encoding: "MP3", probe: "audio/mpeg" },
+];
+
+export const DEFAULT_AUDIO_MIME_TYPE = "audio/mpeg";
+
+/**
+ * Encodings this browser can play, announced as `audioFormats` on user:join
+ * @returns {string[]} e.g. ["OGG_OPUS", "MP3"]
+ */
+export function getSupportedAudioFormats() {
+	try {
+		const audio = document.createElement("audio");
+		const formats = AUDIO_FORMATS.filter(
+			({ probe }) => audio.canPlayType(probe) !== ""
+		).map(({ encoding }) => encoding);
+		return formats.length ? formats : ["MP3"];
+	} catch {
+		return ["MP3"];
+	}
+}
@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef, useCallback, useMemo } from "react";
 import { io } from "socket.io-client";
 import { getJwtUserId } from "../../utils/jwt";
+import { getSupportedAudioFormats } from "../../utils/audioFormats";
 import {
 	getSessions,
 	getMessages,
@@ -65,7 +66,11 @@ const ChatScreen = ({ jwt }) => {
 			try {
 				const user_id = getJwtUserId(jwt);
 				if (user_id) {
-					socketRef.current.emit("user:join", { user_id });
+					socketRef.current.emit("user:join", {
+						user_id,
+						audioTransport: "binary",
+						audioFormats: getSupportedAudioFormats(),
+					});
 				}
 			} catch {}
 		}
@@ -134,6 +139,26 @@ const ChatScreen = ({ jwt }) => {
 			});
 		});
 
+		// Listen for AI response failure (e.g. server busy)
+		socket.on("ai:response:error", (data) => {
+			if (data.session_id !== selectedSession) return;
+			setIsTyping(false);
+			aiStreamingRef.current = "";
+			setAiStreamingText("");
+			setMessages((msgs) => [
+				...msgs.filter((m) => !(m.sender === "AI" && m.streaming)),
+				{
+					id: Date.now(),
+					sender: "AI",
+					text:
+						data.code === "BUSY"
+							? "The assistant is busy right now. Please try again in a moment."
+							: "Something went wrong generating a reply. Please try again.",
+					streaming: false,
+				},
+			]);
+		});
+
 		// Listen for session title update
 		socket.on("session:title:update", (data) => {
 			setSessions((prevSessions) =>
@@ -146,6 +171,7 @@ const ChatScreen = ({ jwt }) => {
 		return () => {
 			socket.off("ai:response:chunk");
 			socket.off("ai:response:end");
+			socket.off("ai:response:error");
 			socket.off("session:title:update");
 		};
 	}, [jwt, selectedSession]);
@@ -384,7 +410,7 @@ const ChatScreen = ({ jwt }) => {
 		// Audio chunk assembly
 		socket.on("tts:audio", async (data) => {
 			// Add the chunk for the specific message
-			addAudioChunk(data.bytes, data.messageId);
+			addAudioChunk(data.bytes, data.messageId, data.mimeType);
 			if (data.isLast) {
 				const messageText = messages.find(
 					(m) => m.id === data.messageId